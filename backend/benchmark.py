@@ -0,0 +1,460 @@
+"""Reproducible load test and micro-benchmarks for the Verdant API.
+
+Boots ``server.app`` in-process (no sockets) against either a real MongoDB
+(``--mongo-url``) or an in-memory mongomock stand-in, replaces the model with
+a local fake that answers after ``--llm-latency`` seconds, drives a weighted
+mix of endpoints at ``--concurrency`` and prints a JSON report with RPS,
+p50/p95/p99 latency and per-request allocation peaks per endpoint.
+
+Examples:
+    python benchmark.py --duration 20 --concurrency 32 --output bench.json
+    python benchmark.py --mix plants=8,login=1 --mongo-url mongodb://localhost:27017
+    python benchmark.py --micro-only
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+import uuid
+from pathlib import Path
+
+DEFAULT_MIX = "plants=6,plant_detail=2,login=1,me=2,history=2,quiz=1,identify=1"
+BENCH_PASSWORD = "bench-password"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Use a real MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--db-name", default=f"verdant_bench_{uuid.uuid4().hex[:8]}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to drive the mixed workload")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unrecorded traffic first")
+    parser.add_argument("--users", type=int, default=20, help="Raised to --concurrency if lower")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated endpoint=weight pairs")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds the fake model takes per call")
+    parser.add_argument("--identify-repeat", type=float, default=0.5, help="Share of identify requests reusing a known photo")
+    parser.add_argument("--image-size", default="1600x1200", help="WIDTHxHEIGHT of generated test photos")
+    parser.add_argument("--memory-samples", type=int, default=20, help="Sequential requests per endpoint for allocation peaks; 0 disables")
+    parser.add_argument("--micro-only", action="store_true", help="Only run the serialization and image micro-benchmarks")
+    parser.add_argument("--import-profile", action="store_true", help="Add a python -X importtime breakdown of importing server")
+    parser.add_argument("--import-top", type=int, default=15, help="Modules listed in the import profile")
+    parser.add_argument("--no-micro", action="store_true")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Must run before ``server`` is imported: the server reads its config at import time."""
+    os.environ["DB_NAME"] = args.db_name
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    os.environ.setdefault("IDENTIFY_CACHE_PERSIST", "false")
+    os.environ.setdefault("QUIZ_POOL_REFILL_INTERVAL_SECONDS", "5")
+    # Throughput runs would otherwise just measure 429s; export RATE_LIMIT_ENABLED=true to include the limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+        return "mongodb"
+    try:
+        import mongomock_motor
+        import motor.motor_asyncio
+    except ImportError:
+        sys.exit("mongomock-motor is not installed; install it or pass --mongo-url")
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    return "mongomock"
+
+
+class FakeLlmChat:
+    """Answers like the real model after a fixed delay, with fresh quiz questions on every call."""
+
+    latency = 0.05
+    calls = 0
+
+    def __init__(self, system_message: str):
+        self.system_message = system_message
+
+    async def send_message(self, text, image_base64=None):
+        FakeLlmChat.calls += 1
+        await asyncio.sleep(self.latency)
+        if image_base64:
+            return json.dumps({
+                "plant_name": "Basil",
+                "botanical_name": "Ocimum basilicum",
+                "confidence": "high",
+                "care_instructions": {
+                    "sunlight": "6-8 hours of direct sun",
+                    "water": "Keep soil evenly moist",
+                    "soil": "Rich, well-draining",
+                    "temperature": "18-27°C",
+                    "tips": ["Pinch flowers", "Harvest often", "Water at the base"]
+                }
+            })
+        token = uuid.uuid4().hex[:8]
+        return json.dumps({"questions": [
+            {
+                "question": f"Benchmark question {token}-{i}: which soil drains fastest?",
+                "options": ["Sandy", "Clay", "Silt", "Peat"],
+                "correct_answer": "Sandy"
+            }
+            for i in range(10)
+        ]})
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    # Low-frequency noise compresses like a real photo rather than pure noise
+    small = rng.integers(0, 255, size=(height // 40 + 1, width // 40 + 1, 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((width, height), Image.BICUBIC)
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(samples, elapsed):
+    report = {}
+    for endpoint, entries in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in entries)
+        errors = sum(1 for _, status in entries if status >= 400)
+        statuses = {}
+        for _, status in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report[endpoint] = {
+            "requests": len(entries),
+            "errors": errors,
+            "statuses": statuses,
+            "rps": round(len(entries) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        }
+    return report
+
+
+class Workload:
+    def __init__(self, client, args, server):
+        self.client = client
+        self.args = args
+        self.server = server
+        self.users = []
+        self.plant_ids = []
+        width, height = (int(part) for part in args.image_size.lower().split("x"))
+        self.photo_size = (width, height)
+        self.known_photos = [make_photo(width, height, seed) for seed in range(4)]
+        self.photo_seed = 1000
+
+    async def setup(self):
+        # Startup returns before warm-up finishes; wait as a load balancer would
+        deadline = time.perf_counter() + 60
+        while (await self.client.get("/readyz")).status_code != 200:
+            if time.perf_counter() > deadline:
+                sys.exit("Server did not become ready within 60s")
+            await asyncio.sleep(0.05)
+        for index in range(max(self.args.users, self.args.concurrency)):
+            email = f"bench{index}-{uuid.uuid4().hex[:6]}@example.com"
+            response = await self.client.post("/api/auth/signup", json={"name": f"Bench {index}", "email": email, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            self.users.append({"email": email, "token": response.json()["access_token"]})
+        response = await self.client.get("/api/plants")
+        response.raise_for_status()
+        self.plant_ids = [plant["id"] for plant in response.json()]
+
+    def headers(self, user):
+        return {"Authorization": f"Bearer {user['token']}"}
+
+    async def plants(self, user):
+        return [("plants", await self.client.get("/api/plants"))]
+
+    async def plant_detail(self, user):
+        return [("plant_detail", await self.client.get(f"/api/plants/{random.choice(self.plant_ids)}"))]
+
+    async def login(self, user):
+        response = await self.client.post("/api/auth/login", json={"email": user["email"], "password": BENCH_PASSWORD})
+        return [("login", response)]
+
+    async def me(self, user):
+        return [("me", await self.client.get("/api/auth/me", headers=self.headers(user)))]
+
+    async def history(self, user):
+        return [("quiz_history", await self.client.get("/api/quiz/history", headers=self.headers(user)))]
+
+    async def quiz(self, user):
+        generated = await self.client.get("/api/quiz/generate", headers=self.headers(user))
+        results = [("quiz_generate", generated)]
+        if generated.status_code == 200:
+            body = generated.json()
+            answers = [random.choice(q["options"]) for q in body["questions"]]
+            submitted = await self.client.post(
+                "/api/quiz/submit",
+                json={"answers": answers, "session_id": body.get("session_id")},
+                headers=self.headers(user)
+            )
+            results.append(("quiz_submit", submitted))
+        return results
+
+    async def identify(self, user):
+        if random.random() < self.args.identify_repeat:
+            photo = random.choice(self.known_photos)
+        else:
+            self.photo_seed += 1
+            photo = make_photo(*self.photo_size, self.photo_seed)
+        response = await self.client.post(
+            "/api/identify-plant/upload",
+            files={"file": ("photo.jpg", photo, "image/jpeg")},
+            headers=self.headers(user)
+        )
+        return [("identify", response)]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def drive(workload, weights, concurrency, duration, samples):
+    names = list(weights)
+    probabilities = [weights[name] for name in names]
+    deadline = time.perf_counter() + duration
+
+    async def worker(user):
+        while time.perf_counter() < deadline:
+            operation = getattr(workload, random.choices(names, probabilities)[0])
+            started = time.perf_counter()
+            try:
+                results = await operation(user)
+            except Exception:
+                samples.setdefault("transport_error", []).append((time.perf_counter() - started, 599))
+                continue
+            elapsed = time.perf_counter() - started
+            # Multi-step operations share the elapsed time per step
+            for endpoint, response in results:
+                samples.setdefault(endpoint, []).append((elapsed / len(results), response.status_code))
+
+    # Each worker acts as one user, since a user has a single active quiz session
+    await asyncio.gather(*(worker(workload.users[i % len(workload.users)]) for i in range(concurrency)))
+
+
+async def measure_memory(workload, weights, count):
+    """Peak traced allocation per request, measured sequentially so requests don't overlap."""
+    report = {}
+    tracemalloc.start()
+    try:
+        for name in weights:
+            operation = getattr(workload, name)
+            peaks = []
+            for _ in range(count):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                await operation(random.choice(workload.users))
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            peaks.sort()
+            report[name] = {
+                "peak_alloc_p50_kb": round(percentile(peaks, 0.50) / 1024, 1),
+                "peak_alloc_max_kb": round(peaks[-1] / 1024, 1) if peaks else 0.0,
+            }
+    finally:
+        tracemalloc.stop()
+    return report
+
+
+async def run_load(args, server, httpx):
+    FakeLlmChat.latency = args.llm_latency
+    server.llm_gateway.chat_factory = FakeLlmChat
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            workload = Workload(client, args, server)
+            await workload.setup()
+            weights = parse_mix(args.mix)
+            unknown = [name for name in weights if not hasattr(workload, name) or name.startswith("_")]
+            if unknown:
+                sys.exit(f"Unknown workload entries: {', '.join(unknown)}")
+
+            if args.warmup > 0:
+                await drive(workload, weights, args.concurrency, args.warmup, {})
+
+            samples = {}
+            llm_calls_before = FakeLlmChat.calls
+            started = time.perf_counter()
+            await drive(workload, weights, args.concurrency, args.duration, samples)
+            elapsed = time.perf_counter() - started
+
+            total = sum(len(entries) for entries in samples.values())
+            model_backed = [name for name in ("identify", "quiz") if weights.get(name)]
+            if model_backed and not FakeLlmChat.calls:
+                # The model endpoints never reached the fake, so their numbers measure error paths
+                sys.exit(f"Fake LLM was never called although the mix includes {', '.join(model_backed)} "
+                         f"({server.llm_gateway.stats()['failures']} gateway failures)")
+            report = {
+                "elapsed_seconds": round(elapsed, 3),
+                "total_requests": total,
+                "total_rps": round(total / elapsed, 2) if elapsed else 0.0,
+                "llm_calls": FakeLlmChat.calls - llm_calls_before,
+                "endpoints": summarize(samples, elapsed),
+            }
+            if args.memory_samples > 0:
+                report["memory"] = await measure_memory(workload, weights, args.memory_samples)
+            report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            return report
+    finally:
+        await server.app.router.shutdown()
+
+
+def time_call(fn, number):
+    return round(min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6, 2)
+
+
+def run_micro(server, args):
+    """Per-call microseconds for response serialization and image decode paths."""
+    from fastapi.encoders import jsonable_encoder
+    from PIL import Image
+
+    plant = {
+        "id": str(uuid.uuid4()), "name": "Tomato", "botanical_name": "Solanum lycopersicum",
+        "description": "A popular vegetable that's easy to grow and produces abundant fruit. Perfect for beginners.",
+        "sunlight": "High", "water": "Medium", "soil": "Well-draining, rich in organic matter", "difficulty": "Easy",
+        "growing_time": "60-80 days", "harvest_season": "Summer to Fall",
+        "care_tips": ["Stake or cage plants for support", "Water consistently", "Prune suckers", "Feed every 2 weeks"],
+        "image_url": "https://images.unsplash.com/photo-1592921870789-04563d55041c?w=400", "category": "Vegetable"
+    }
+    report = {"plant_list_serialization_us": {}, "image_decode_us": {}}
+    for size in (8, 100, 1000):
+        plants = [dict(plant, id=str(uuid.uuid4())) for _ in range(size)]
+        serialized = [json.dumps(p, separators=(",", ":")).encode() for p in plants]
+        number = max(1, 2000 // size)
+        report["plant_list_serialization_us"][str(size)] = {
+            "validate_and_encode": time_call(lambda: json.dumps(jsonable_encoder([server.Plant(**p) for p in plants])), number),
+            "stdlib_json_dumps": time_call(lambda: json.dumps(plants), number),
+            "json_bytes": time_call(lambda: server.json_bytes(plants), number),
+            "preserialized_join": time_call(lambda: b"[" + b",".join(serialized) + b"]", number),
+        }
+
+    from pydantic import TypeAdapter
+
+    attempts = [
+        {"id": str(uuid.uuid4()), "score": i % 11, "total_questions": 10, "percentage": (i % 11) * 10.0,
+         "created_at": "2026-01-01T12:00:00.000000+00:00"}
+        for i in range(100)
+    ]
+    history_adapter = TypeAdapter(list[server.QuizAttemptHistory])
+    report["quiz_history_serialization_us"] = {
+        "response_model_path": time_call(lambda: json.dumps(history_adapter.dump_python(history_adapter.validate_python(attempts), mode="json")).encode(), 50),
+        "trusted_json_bytes": time_call(lambda: server.json_bytes(attempts), 50),
+        "fast_json_responses": server.FAST_JSON_RESPONSES,
+    }
+
+    width, height = (int(part) for part in args.image_size.lower().split("x"))
+    photo = make_photo(width, height, 7)
+    photo_base64 = base64.b64encode(photo).decode("ascii")
+
+    def decode_full():
+        with Image.open(io.BytesIO(photo)) as image:
+            image.load()
+
+    report["image_decode_us"] = {
+        "photo_bytes": len(photo),
+        "base64_decode": time_call(lambda: base64.b64decode(photo_base64), 20),
+        "pillow_full_decode": time_call(decode_full, 5),
+        "pipeline_normalize": time_call(lambda: server.image_pipeline._process(photo), 5),
+    }
+    return report
+
+
+def import_profile(top: int) -> dict:
+    """Import ``server`` in a fresh interpreter under ``-X importtime`` and rank modules by cumulative time."""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=Path(__file__).parent, env=os.environ.copy(), capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"}
+
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nesting is shown by two spaces of indentation per level after the separator's own space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append({
+            "module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000, "depth": depth
+        })
+    # Depth 1 entries are the modules server.py imports directly, each with its subtree
+    direct = sorted((m for m in modules if m["depth"] == 1), key=lambda m: -m["cumulative_ms"])
+    return {
+        "interpreter_wall_ms": round(wall * 1000, 1),
+        "server_import_ms": next((m["cumulative_ms"] for m in modules if m["module"] == "server"), None),
+        "modules_imported": len(modules),
+        "slowest": [{k: m[k] for k in ("module", "self_ms", "cumulative_ms")} for m in direct[:top]],
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    backend = configure_environment(args)
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    import httpx
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = {
+        "revision": git_revision(),
+        "mongo": backend,
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "users": args.users,
+            "mix": args.mix, "llm_latency": args.llm_latency, "image_size": args.image_size,
+        },
+    }
+    if args.import_profile:
+        report["import_profile"] = import_profile(args.import_top)
+    if not args.micro_only:
+        report["load"] = asyncio.run(run_load(args, server, httpx))
+    if not args.no_micro:
+        report["micro"] = run_micro(server, args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Print the query plan of every hot query in server.py and fail on collection scans.
+
+Usage: python explain_queries.py  (reads MONGO_URL / DB_NAME like the server)
+"""
+import asyncio
+import json
+import sys
+
+import server
+
+
+async def main() -> int:
+    await server.ensure_indexes()
+    report = await server.explain_hot_queries()
+    print(json.dumps({"indexes": server.index_status, "queries": report}, indent=2))
+    server.client.close()
+    scans = [entry["query"] for entry in report if entry.get("collection_scan")]
+    if scans:
+        print(f"Collection scans detected: {', '.join(scans)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,45 +1,366 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, status, UploadFile, File
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError, field_validator
+from typing import List, Optional, Dict, Any, Callable
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 import bcrypt
 import jwt
 import base64
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+import binascii
+import hashlib
+import hmac
+import io
+import json
+import math
+import re
+from bisect import bisect_left, bisect_right
 import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+import numpy as np
+from PIL import Image, ImageOps
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL_SECONDS', 0.5))
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name, self.documentation, self.labels = name, documentation, labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self.values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.documentation, self.labels, self.buckets = name, documentation, labels, buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labels + ("le",)
+        for label_values, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, label_values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, label_values + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return lines
+
+HTTP_REQUEST_DURATION = Histogram("verdant_http_request_duration_seconds", "HTTP request latency by route and status.", ("method", "route", "status"))
+HTTP_REQUEST_SIZE = Histogram("verdant_http_request_size_bytes", "HTTP request body size by route.", ("method", "route"), SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = Histogram("verdant_http_response_size_bytes", "HTTP response body size by route.", ("method", "route"), SIZE_BUCKETS)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("verdant_http_requests_in_flight", "HTTP requests currently being served.")
+MONGO_COMMAND_DURATION = Histogram("verdant_mongo_command_duration_seconds", "MongoDB command latency by command and collection.", ("command", "collection", "outcome"))
+LLM_CALL_DURATION = Histogram("verdant_llm_call_duration_seconds", "Model call latency by outcome.", ("outcome",))
+PASSWORD_HASH_DURATION = Histogram("verdant_password_hash_duration_seconds", "bcrypt hash/verify latency on the hashing executor.", ("operation",))
+IMAGE_STAGE_DURATION = Histogram("verdant_image_stage_duration_seconds", "Image preprocessing latency by stage.", ("stage",))
+EVENT_LOOP_LAG = Histogram("verdant_event_loop_lag_seconds", "Delay between a scheduled event-loop wakeup and when it actually ran.")
+EVENT_LOOP_LAG_LAST = Gauge("verdant_event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+RATE_LIMIT_DECISIONS = Counter("verdant_rate_limit_decisions_total", "Rate limiter decisions by rule and outcome.", ("rule", "outcome"))
+CACHE_INVALIDATION_LAG = Histogram("verdant_cache_invalidation_lag_seconds", "Delay between a write and this worker applying its cache invalidation.", ("collection", "source"))
+METRICS = [
+    HTTP_REQUEST_DURATION, HTTP_REQUEST_SIZE, HTTP_RESPONSE_SIZE, HTTP_REQUESTS_IN_FLIGHT,
+    MONGO_COMMAND_DURATION, LLM_CALL_DURATION, PASSWORD_HASH_DURATION, IMAGE_STAGE_DURATION,
+    EVENT_LOOP_LAG, EVENT_LOOP_LAG_LAST, RATE_LIMIT_DECISIONS, CACHE_INVALIDATION_LAG,
+]
+
+# Times every command the driver sends, which covers each db.* call without wrapping them
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self.pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self.pending[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome: str):
+        collection = self.pending.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+# ASGI middleware recording latency, sizes and in-flight requests per route template
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+        request_bytes = 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(amount=1)
+        try:
+            await self.app(scope, counting_receive, recording_send)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.inc(amount=-1)
+            # Label by route template, never the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method, route_label, str(status_code))
+            HTTP_REQUEST_SIZE.observe(request_bytes, method, route_label)
+            HTTP_RESPONSE_SIZE.observe(response_bytes, method, route_label)
+
+async def monitor_event_loop_lag(interval: float):
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - expected)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+def _flatten_stats(prefix: str, value, lines: List[str]):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        lines.append(f"{prefix} {value}")
+    elif isinstance(value, dict):
+        for key, child in value.items():
+            _flatten_stats(f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}", child, lines)
+
+def render_metrics(subsystem_stats: dict) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    # Subsystem counters from /api/metrics are exported as untyped gauges
+    for name, stats in subsystem_stats.items():
+        _flatten_stats(f"verdant_{name}", stats, lines)
+    return "\n".join(lines) + "\n"
+
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()])
 db = client[os.environ.get('DB_NAME', 'test_database')]
+# /readyz reports not ready when MongoDB does not answer a ping within this long
+READINESS_PING_TIMEOUT_SECONDS = float(os.environ.get('READINESS_PING_TIMEOUT_SECONDS', 2))
+# Indexes that failed at startup (conflicting legacy index, duplicate data) are retried this often
+INDEX_RETRY_SECONDS = float(os.environ.get('INDEX_RETRY_SECONDS', 300))
+
+# Plant catalog snapshot is re-checked against its version stamp at most this often
+CATALOG_REFRESH_SECONDS = float(os.environ.get('CATALOG_REFRESH_SECONDS', 30))
+PLANTS_DEFAULT_PAGE_SIZE = int(os.environ.get('PLANTS_DEFAULT_PAGE_SIZE', 20))
+PLANTS_MAX_PAGE_SIZE = int(os.environ.get('PLANTS_MAX_PAGE_SIZE', 100))
+
+# Abandoned quiz sessions are removed by a TTL index after this long
+QUIZ_SESSION_TTL_SECONDS = int(os.environ.get('QUIZ_SESSION_TTL_SECONDS', 24 * 3600))
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
+# Embed name/email/created_at in the signed token so authentication needs no user lookup
+JWT_PROFILE_CLAIMS = os.environ.get('JWT_PROFILE_CLAIMS', 'false').lower() == 'true'
+
+# Bearer token required by /metrics and /api/metrics; both are disabled while unset
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Authenticated user cache configuration
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+
+# Cross-worker cache invalidation configuration
+CACHE_INVALIDATION_MODE = os.environ.get('CACHE_INVALIDATION_MODE', 'auto').lower()  # "auto", "change_stream", "poll" or "off"
+CACHE_INVALIDATION_POLL_SECONDS = float(os.environ.get('CACHE_INVALIDATION_POLL_SECONDS', 1))
+
+# Rate limiting configuration
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # "memory" (per process) or "mongo" (shared by all workers)
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+# Use the first X-Forwarded-For address as the client IP; only safe behind a proxy that overwrites it
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true'
+# "<burst>/<seconds>": up to <burst> requests at once, refilled evenly over <seconds>; empty disables the rule
+RATE_LIMITS = {
+    "identify": os.environ.get('RATE_LIMIT_IDENTIFY', '10/60'),
+    "identify_batch": os.environ.get('RATE_LIMIT_IDENTIFY_BATCH', '3/60'),
+    "quiz_generate": os.environ.get('RATE_LIMIT_QUIZ_GENERATE', '6/60'),
+    "login": os.environ.get('RATE_LIMIT_LOGIN', '10/60'),
+    # Shared by every user, guarding the upstream model quota as a whole
+    "llm_global": os.environ.get('RATE_LIMIT_LLM_GLOBAL', ''),
+}
+
+# Password hashing configuration
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 64))
 
 # LLM Configuration
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-5.1')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 60))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.environ.get('LLM_RETRY_BASE_DELAY_SECONDS', 0.5))
+LLM_BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', 5))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', 30))
+# Follow-up prompts allowed when a reply cannot be parsed or repaired into the expected schema
+LLM_OUTPUT_MAX_REPROMPTS = int(os.environ.get('LLM_OUTPUT_MAX_REPROMPTS', 1))
+
+# Identification cache configuration
+IDENTIFY_CACHE_MAX_ENTRIES = int(os.environ.get('IDENTIFY_CACHE_MAX_ENTRIES', 1024))
+IDENTIFY_CACHE_TTL_SECONDS = int(os.environ.get('IDENTIFY_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+IDENTIFY_CACHE_PHASH_DISTANCE = int(os.environ.get('IDENTIFY_CACHE_PHASH_DISTANCE', 4))
+IDENTIFY_CACHE_PERSIST = os.environ.get('IDENTIFY_CACHE_PERSIST', 'true').lower() == 'true'
+
+# Image preprocessing configuration
+IMAGE_MAX_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', 1024))
+IMAGE_OUTPUT_FORMAT = os.environ.get('IMAGE_OUTPUT_FORMAT', 'JPEG').upper()  # "JPEG" or "WEBP"
+IMAGE_OUTPUT_QUALITY = int(os.environ.get('IMAGE_OUTPUT_QUALITY', 85))
+IMAGE_PIPELINE_WORKERS = int(os.environ.get('IMAGE_PIPELINE_WORKERS', os.cpu_count() or 2))
+IMAGE_ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP", "TIFF", "MPO"}
+IDENTIFY_UPLOAD_MAX_BYTES = int(os.environ.get('IDENTIFY_UPLOAD_MAX_BYTES', 15 * 1024 * 1024))
+UPLOAD_READ_CHUNK_BYTES = 256 * 1024
+
+# Local pre-classifier configuration: confident matches against catalog reference images skip the model
+LOCAL_CLASSIFIER_ENABLED = os.environ.get('LOCAL_CLASSIFIER_ENABLED', 'false').lower() == 'true'
+# One sub-directory per plant named after its slug, e.g. reference_images/tomato/*.jpg
+LOCAL_CLASSIFIER_REFERENCE_DIR = Path(os.environ.get('LOCAL_CLASSIFIER_REFERENCE_DIR', str(ROOT_DIR / 'reference_images')))
+# Download a plant's image_url into the reference directory when it has no images yet
+LOCAL_CLASSIFIER_FETCH_IMAGES = os.environ.get('LOCAL_CLASSIFIER_FETCH_IMAGES', 'false').lower() == 'true'
+LOCAL_CLASSIFIER_MIN_SIMILARITY = float(os.environ.get('LOCAL_CLASSIFIER_MIN_SIMILARITY', 0.92))
+LOCAL_CLASSIFIER_MIN_MARGIN = float(os.environ.get('LOCAL_CLASSIFIER_MIN_MARGIN', 0.03))
+
+# Batch identification configuration
+IDENTIFY_BATCH_MAX_IMAGES = int(os.environ.get('IDENTIFY_BATCH_MAX_IMAGES', 10))
+IDENTIFY_BATCH_CONCURRENCY = int(os.environ.get('IDENTIFY_BATCH_CONCURRENCY', 4))
+
+# Identification history configuration
+IDENTIFICATIONS_DEFAULT_PAGE_SIZE = int(os.environ.get('IDENTIFICATIONS_DEFAULT_PAGE_SIZE', 20))
+IDENTIFICATIONS_MAX_PAGE_SIZE = int(os.environ.get('IDENTIFICATIONS_MAX_PAGE_SIZE', 100))
+IDENTIFICATION_SUMMARY_RECENT = int(os.environ.get('IDENTIFICATION_SUMMARY_RECENT', 10))
+
+# Write-behind configuration for append-only records (identifications, quiz attempts)
+# Buffered records are lost if the process dies before a flush, so this is opt-in
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 100))
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL_SECONDS', 0.25))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 5000))
+
+# Asynchronous identification job configuration
+IDENTIFY_JOB_WORKERS = int(os.environ.get('IDENTIFY_JOB_WORKERS', 4))
+IDENTIFY_JOB_QUEUE_SIZE = int(os.environ.get('IDENTIFY_JOB_QUEUE_SIZE', 200))
+IDENTIFY_JOB_TTL_SECONDS = int(os.environ.get('IDENTIFY_JOB_TTL_SECONDS', 24 * 3600))
+IDENTIFY_JOB_POLL_SECONDS = float(os.environ.get('IDENTIFY_JOB_POLL_SECONDS', 1.0))
+
+# Quiz question pool configuration
+QUIZ_POOL_ENABLED = os.environ.get('QUIZ_POOL_ENABLED', 'true').lower() == 'true'
+QUIZ_TOPICS = [t.strip() for t in os.environ.get('QUIZ_TOPICS', 'soil types,plant care').split(',') if t.strip()]
+QUIZ_QUESTIONS_PER_QUIZ = int(os.environ.get('QUIZ_QUESTIONS_PER_QUIZ', 5))
+QUIZ_POOL_TARGET = int(os.environ.get('QUIZ_POOL_TARGET', 60))
+QUIZ_POOL_LOW_WATERMARK = int(os.environ.get('QUIZ_POOL_LOW_WATERMARK', 20))
+QUIZ_POOL_BATCH_SIZE = int(os.environ.get('QUIZ_POOL_BATCH_SIZE', 10))
+QUIZ_POOL_MAX_SERVES = int(os.environ.get('QUIZ_POOL_MAX_SERVES', 25))
+QUIZ_POOL_REFILL_INTERVAL_SECONDS = float(os.environ.get('QUIZ_POOL_REFILL_INTERVAL_SECONDS', 60))
+QUIZ_SEEN_HISTORY = int(os.environ.get('QUIZ_SEEN_HISTORY', 500))
+
+# Response encoding configuration
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', 'true').lower() == 'true' and orjson is not None
+# Bodies smaller than this are sent uncompressed; 0 disables compression
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+RESPONSE_COMPRESSION_LEVEL = int(os.environ.get('RESPONSE_COMPRESSION_LEVEL', 6))
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse if FAST_JSON_RESPONSES else JSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Security
 security = HTTPBearer()
+optional_bearer = HTTPBearer(auto_error=False)
 
 # Models
 class UserCreate(BaseModel):
@@ -88,6 +409,78 @@ class PlantIdentificationResponse(BaseModel):
     confidence: str
     care_instructions: Dict[str, Any]
     identified_at: str
+    cached: bool = False
+    source: str = "model"  # "model" or "catalog" when answered by the local classifier
+
+class BatchIdentificationItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    status: str
+    identification: Optional[PlantIdentificationResponse] = None
+    duplicate_of: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchIdentificationResponse(BaseModel):
+    results: List[BatchIdentificationItem]
+    succeeded: int
+    failed: int
+
+class IdentificationListItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    plant_name: str
+    botanical_name: Optional[str] = None
+    confidence: str
+    identified_at: str
+    care_instructions: Optional[Dict[str, Any]] = None
+
+class IdentificationPage(BaseModel):
+    items: List[IdentificationListItem]
+    next_cursor: Optional[str] = None
+
+class IdentifiedPlantCount(BaseModel):
+    plant_name: str
+    count: int
+
+class IdentificationSummary(BaseModel):
+    total: int
+    plants: List[IdentifiedPlantCount]
+    recent: List[IdentificationListItem]
+
+class CareInstructions(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    sunlight: str
+    water: str
+    soil: str
+    temperature: str
+    tips: List[str] = Field(default_factory=list)
+
+    @field_validator("sunlight", "water", "soil", "temperature", mode="before")
+    @classmethod
+    def join_lists(cls, value):
+        if isinstance(value, list):
+            return " ".join(str(item) for item in value)
+        return str(value) if isinstance(value, (int, float)) else value
+
+    @field_validator("tips", mode="before")
+    @classmethod
+    def split_tips(cls, value):
+        if isinstance(value, str):
+            return [tip.strip(" -•*") for tip in re.split(r"[\n;]+", value) if tip.strip(" -•*")]
+        return value
+
+# Schema the model's identification reply must satisfy before it is saved or cached
+class PlantIdentificationResult(BaseModel):
+    plant_name: str = Field(min_length=1)
+    botanical_name: Optional[str] = None
+    confidence: str = "medium"
+    care_instructions: CareInstructions
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def normalize_confidence(cls, value):
+        text = str(value).strip().lower()
+        return next((level for level in ("high", "medium", "low") if level in text), "medium")
 
 class QuizQuestion(BaseModel):
     question: str
@@ -96,9 +489,12 @@ class QuizQuestion(BaseModel):
 
 class QuizGenerateResponse(BaseModel):
     questions: List[QuizQuestion]
+    session_id: Optional[str] = None
 
 class QuizSubmitRequest(BaseModel):
     answers: List[str]
+    # When given, a submission for a superseded quiz is rejected instead of graded against the new one
+    session_id: Optional[str] = None
 
 class QuizSubmitResponse(BaseModel):
     score: int
@@ -107,6 +503,31 @@ class QuizSubmitResponse(BaseModel):
     correct_answers: List[str]
     attempt_id: str
 
+class QuizTopicStats(BaseModel):
+    topic: str
+    correct: int
+    total: int
+    accuracy: float
+
+class QuizStatsResponse(BaseModel):
+    attempts: int
+    average_percentage: float
+    best_percentage: float
+    best_score: int
+    total_score: int
+    total_questions: int
+    current_streak: int
+    longest_streak: int
+    last_attempt_at: Optional[str] = None
+    topics: List[QuizTopicStats]
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    name: str
+    best_percentage: float
+    attempts: int
+    average_percentage: float
+
 class QuizAttemptHistory(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -122,11 +543,230 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def create_access_token(user_id: str) -> str:
+# Keeps a rolling window of durations for percentile snapshots
+class LatencyTracker:
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+def _timed_call(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return started, time.perf_counter(), result
+
+# Runs bcrypt on a dedicated executor so auth traffic never blocks the event loop
+class PasswordHasher:
+    def __init__(self, workers: int, queue_size: int, kind: str = "thread"):
+        self.workers = max(1, workers)
+        self.max_pending = self.workers + max(0, queue_size)
+        self.kind = kind
+        if kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.rejected = 0
+        self.queue_wait = LatencyTracker()
+        self.hash_latency = LatencyTracker()
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        enqueued = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            started, finished, result = await loop.run_in_executor(self.executor, _timed_call, fn, *args)
+        finally:
+            self.pending -= 1
+        PASSWORD_HASH_DURATION.observe(finished - started, fn.__name__)
+        if self.kind == "thread":
+            # perf_counter is only comparable across threads of the same process
+            self.queue_wait.observe(max(0.0, started - enqueued))
+        self.hash_latency.observe(finished - started)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "queue_depth": max(0, self.pending - self.workers),
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.snapshot(),
+            "hash_latency": self.hash_latency.snapshot(),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE, PASSWORD_HASH_EXECUTOR)
+
+# In-process LRU with per-entry expiry and hit/miss counters
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def items(self):
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in self.entries.items() if expires_at > now]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Content-addressed store of model identifications
+class IdentificationCache:
+    def __init__(self, max_entries: int, ttl_seconds: int, max_distance: int, persist: bool):
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.persist = persist
+        self.near_hits = 0
+        self.persistent_hits = 0
+
+    async def lookup(self, sha256: str, phash: Optional[int]) -> Optional[dict]:
+        entry = self.memory.get(sha256)
+        if entry is not None:
+            return entry["result"]
+
+        if phash is not None and self.max_distance >= 0:
+            for _, candidate in self.memory.items():
+                if candidate["phash"] is not None and bin(candidate["phash"] ^ phash).count("1") <= self.max_distance:
+                    self.near_hits += 1
+                    return candidate["result"]
+
+        if self.persist:
+            doc = await db.identification_cache.find_one(
+                {"image_sha256": sha256, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"_id": 0, "result": 1, "phash": 1}
+            )
+            if doc:
+                self.persistent_hits += 1
+                phash_value = int(doc["phash"], 16) if doc.get("phash") else None
+                self.memory.set(sha256, {"phash": phash_value, "result": doc["result"]})
+                return doc["result"]
+        return None
+
+    async def store(self, sha256: str, phash: Optional[int], result: dict):
+        self.memory.set(sha256, {"phash": phash, "result": result})
+        if self.persist:
+            now = datetime.now(timezone.utc)
+            await db.identification_cache.update_one(
+                {"image_sha256": sha256},
+                {"$set": {
+                    "image_sha256": sha256,
+                    "phash": format(phash, "016x") if phash is not None else None,
+                    "result": result,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                }},
+                upsert=True
+            )
+
+    def stats(self) -> dict:
+        return {
+            **self.memory.stats(),
+            "near_duplicate_hits": self.near_hits,
+            "persistent_hits": self.persistent_hits,
+        }
+
+user_cache = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+user_cache_stats = {"claims": 0}
+
+identification_cache = IdentificationCache(
+    IDENTIFY_CACHE_MAX_ENTRIES,
+    IDENTIFY_CACHE_TTL_SECONDS,
+    IDENTIFY_CACHE_PHASH_DISTANCE,
+    IDENTIFY_CACHE_PERSIST
+)
+
+PROFILE_CLAIMS = ("name", "email", "created_at")
+
+def create_access_token(user_id: str, profile: Optional[dict] = None) -> str:
     payload = {
         "user_id": user_id,
         "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
+    if JWT_PROFILE_CLAIMS and profile:
+        payload.update({claim: profile[claim] for claim in PROFILE_CLAIMS})
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def decode_token(token: str) -> dict:
@@ -141,183 +781,621 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token = credentials.credentials
     payload = decode_token(token)
     user_id = payload.get("user_id")
-    
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+
+    if all(claim in payload for claim in PROFILE_CLAIMS):
+        user_cache_stats["claims"] += 1
+        return {"id": user_id, **{claim: payload[claim] for claim in PROFILE_CLAIMS}}
+
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    user_cache.set(user_id, user)
     return user
 
+# Drop a user from this worker's cache; other workers evict it on the change-stream event, or after USER_CACHE_TTL_SECONDS when polling
+def invalidate_cached_user(user_id: str):
+    user_cache.delete(user_id)
+
+# Rate limiting
+class RateLimitRule:
+    def __init__(self, name: str, spec: str):
+        burst, _, seconds = spec.partition("/")
+        self.name = name
+        self.capacity = float(burst)
+        self.refill_per_second = self.capacity / float(seconds or 1)
+
+    def retry_after(self, tokens: float, cost: float) -> float:
+        return (cost - tokens) / self.refill_per_second
+
+# Token buckets per (rule, key), held in process memory or in the rate_limits collection
+class RateLimiter:
+    def __init__(self, enabled: bool, backend: str, max_keys: int, specs: Dict[str, str]):
+        self.enabled = enabled
+        self.backend = backend if backend in ("memory", "mongo") else "memory"
+        self.max_keys = max_keys
+        self.rules = {name: RateLimitRule(name, spec) for name, spec in specs.items() if spec}
+        self.buckets = OrderedDict()
+        self.allowed = {name: 0 for name in self.rules}
+        self.limited = {name: 0 for name in self.rules}
+        self.errors = 0
+        self.latency = LatencyTracker()
+
+    def _take_memory(self, rule: RateLimitRule, key: str, cost: float) -> float:
+        now = time.monotonic()
+        bucket_key = (rule.name, key)
+        tokens, updated = self.buckets.pop(bucket_key, (rule.capacity, now))
+        tokens = min(rule.capacity, tokens + (now - updated) * rule.refill_per_second)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = rule.retry_after(tokens, cost)
+        self.buckets[bucket_key] = (tokens, now)
+        # An evicted bucket simply starts full again
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return wait
+
+    async def _take_mongo(self, rule: RateLimitRule, key: str, cost: float) -> float:
+        now = time.time()
+        refilled = {"$min": [rule.capacity, {"$add": [
+            {"$ifNull": ["$tokens", rule.capacity]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, rule.refill_per_second]}
+        ]}]}
+        doc = await db.rate_limits.find_one_and_update(
+            {"_id": f"{rule.name}:{key}"},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", cost]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", cost]}, {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=rule.capacity / rule.refill_per_second),
+                }},
+            ],
+            projection={"_id": 0, "tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return 0.0 if doc["allowed"] else rule.retry_after(doc["tokens"], cost)
+
+    # Consume cost tokens or raise 429 with Retry-After. A failing Mongo backend lets requests through
+    async def check(self, rule_name: str, key: str, cost: float = 1.0):
+        rule = self.rules.get(rule_name)
+        if not self.enabled or rule is None:
+            return
+        # A cost above the burst could never be paid; it drains a full bucket instead
+        cost = min(cost, rule.capacity)
+        started = time.perf_counter()
+        try:
+            if self.backend == "mongo":
+                wait = await self._take_mongo(rule, key, cost)
+            else:
+                wait = self._take_memory(rule, key, cost)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Rate limiter error for {rule_name}: {str(e)}")
+            return
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+        if wait <= 0:
+            self.allowed[rule_name] += 1
+            RATE_LIMIT_DECISIONS.inc(rule_name, "allowed")
+            return
+        self.limited[rule_name] += 1
+        RATE_LIMIT_DECISIONS.inc(rule_name, "limited")
+        retry_after = max(1, math.ceil(wait))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests, please retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "buckets": len(self.buckets),
+            "rules": {
+                name: {
+                    "capacity": rule.capacity,
+                    "refill_per_second": round(rule.refill_per_second, 4),
+                    "allowed": self.allowed[name],
+                    "limited": self.limited[name],
+                }
+                for name, rule in self.rules.items()
+            },
+            "errors": self.errors,
+            "decision_latency": self.latency.snapshot(),
+        }
+
+rate_limiter = RateLimiter(RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_MAX_KEYS, RATE_LIMITS)
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return request.client.host if request.client else "unknown"
+
+# Dependency charging one token per request to the caller's bucket and, if given, a shared bucket
+def rate_limit(rule_name: str, global_rule: Optional[str] = None):
+    async def dependency(current_user: dict = Depends(get_current_user)):
+        await rate_limiter.check(rule_name, current_user["id"])
+        if global_rule:
+            await rate_limiter.check(global_rule, "all")
+    return dependency
+
+def rate_limit_by_ip(rule_name: str):
+    async def dependency(request: Request):
+        await rate_limiter.check(rule_name, client_ip(request))
+    return dependency
+
+# Write-behind buffer
+# Collects append-only inserts and writes them in batches from a background flusher
+class WriteBehindBuffer:
+    def __init__(self, enabled: bool, batch_size: int, flush_interval: float, max_pending: int):
+        self.enabled = enabled
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.queues = {}
+        self.in_flight = []
+        self.queued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.flush_latency = LatencyTracker()
+        self._task = None
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    # Stop the flusher and drain everything still queued
+    async def stop(self):
+        if self._task is not None:
+            # Not cancelled: a batch taken off the queues mid-write would be lost
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        for _ in range(3):
+            if not self.queued:
+                break
+            await self.flush()
+        if self.queued:
+            logging.error(f"Write-behind buffer lost {self.queued} records at shutdown")
+
+    async def insert(self, collection: str, doc: dict):
+        if self._task is None or self._stopping or self.queued >= self.max_pending:
+            if self._task is not None and not self._stopping:
+                self.sync_writes += 1
+            await db[collection].insert_one(dict(doc))
+            return
+        self.queues.setdefault(collection, []).append(doc)
+        self.queued += 1
+        if self.queued >= self.batch_size:
+            self._wakeup.set()
+
+    def pending_for(self, collection: str, user_id: str) -> List[dict]:
+        batches = [docs for name, docs in self.in_flight if name == collection]
+        batches.append(self.queues.get(collection, []))
+        return [doc for docs in batches for doc in docs if doc["user_id"] == user_id]
+
+    # Write one batch; returns the records that should be retried
+    async def _write(self, collection: str, docs: List[dict]) -> List[dict]:
+        try:
+            # Copies, so the driver's generated _id never leaks into records merged into responses
+            await db[collection].insert_many([dict(doc) for doc in docs], ordered=False)
+            return []
+        except BulkWriteError as e:
+            # Duplicate ids were already written by an earlier attempt; other per-record errors would repeat forever
+            errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+            if errors:
+                self.dropped += len(errors)
+                logging.error(f"Write-behind dropped {len(errors)} {collection} records: {errors[0].get('errmsg')}")
+            return []
+        except Exception as e:
+            self.failed_batches += 1
+            logging.error(f"Write-behind flush of {len(docs)} {collection} records failed, will retry: {str(e)}")
+            return docs
+
+    async def flush(self):
+        async with self._flush_lock:
+            queues, self.queues, self.queued = self.queues, {}, 0
+            for collection, docs in queues.items():
+                entry = (collection, docs)
+                self.in_flight.append(entry)
+                started = time.perf_counter()
+                try:
+                    retry = await self._write(collection, docs)
+                finally:
+                    self.in_flight.remove(entry)
+                self.flush_latency.observe(time.perf_counter() - started)
+                self.batches += 1
+                self.flushed += len(docs) - len(retry)
+                if retry:
+                    self.queues[collection] = retry + self.queues.get(collection, [])
+                    self.queued += len(retry)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self.queued:
+                await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self.queued,
+            "in_flight": sum(len(docs) for _, docs in self.in_flight),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "sync_writes": self.sync_writes,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            "flush_latency": self.flush_latency.snapshot(),
+        }
+
+write_behind = WriteBehindBuffer(
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    WRITE_BEHIND_MAX_PENDING
+)
+
+# Fold a user's not-yet-flushed records into a newest-first page of docs
+def merge_pending(docs: List[dict], pending: List[dict], fields, sort_fields: tuple, limit: int) -> List[dict]:
+    seen = {doc["id"] for doc in docs}
+    extra = [{field: doc[field] for field in fields if field in doc} for doc in pending if doc["id"] not in seen]
+    if not extra:
+        return docs
+    merged = sorted(docs + extra, key=lambda doc: tuple(doc[field] for field in sort_fields), reverse=True)
+    return merged[:limit]
+
+# Index management
+INDEX_SPECS = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "plants": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("name", ASCENDING)], unique=True, name="name_unique"),
+        IndexModel([("category", ASCENDING), ("difficulty", ASCENDING)], name="category_difficulty"),
+        IndexModel([("difficulty", ASCENDING)], name="difficulty"),
+    ],
+    "plant_identifications": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("user_id", ASCENDING), ("identified_at", DESCENDING), ("id", DESCENDING)], name="user_identified_at_id"),
+    ],
+    "identification_summaries": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+    ],
+    "identification_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "identification_cache": [
+        IndexModel([("image_sha256", ASCENDING)], unique=True, name="image_sha256_unique"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "quiz_question_bank": [
+        IndexModel([("fingerprint", ASCENDING)], unique=True, name="fingerprint_unique"),
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("topic", ASCENDING), ("served_count", ASCENDING)], name="topic_served_count"),
+        IndexModel([("served_count", ASCENDING)], name="served_count"),
+    ],
+    "quiz_seen_questions": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+    ],
+    "active_quiz_sessions": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "catalog_versions": [
+        IndexModel([("name", ASCENDING)], unique=True, name="name_unique"),
+    ],
+    "quiz_stats": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+        IndexModel([("best_percentage", DESCENDING), ("total_score", DESCENDING)], name="leaderboard"),
+    ],
+    "quiz_attempts": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+}
+
+# (name, collection, filter, sort) for every query on a request path
+HOT_QUERIES = [
+    ("login_by_email", "users", {"email": "probe@example.com"}, None),
+    ("current_user_by_id", "users", {"id": "probe"}, None),
+    ("plants_by_category_difficulty", "plants", {"category": "Herb", "difficulty": "Easy"}, None),
+    ("plants_by_difficulty", "plants", {"difficulty": "Easy"}, None),
+    ("plant_by_id", "plants", {"id": "probe"}, None),
+    ("seed_plant_by_name", "plants", {"name": "probe"}, None),
+    ("identification_history_by_user", "plant_identifications", {"user_id": "probe"}, [("identified_at", DESCENDING), ("id", DESCENDING)]),
+    ("identification_summary_by_user", "identification_summaries", {"user_id": "probe"}, None),
+    ("identification_job_by_id", "identification_jobs", {"id": "probe"}, None),
+    ("identification_cache_by_hash", "identification_cache", {"image_sha256": "probe"}, None),
+    ("quiz_bank_available", "quiz_question_bank", {"topic": "plant care", "served_count": {"$lt": 1}}, None),
+    ("quiz_seen_by_user", "quiz_seen_questions", {"user_id": "probe"}, None),
+    ("active_quiz_session_by_user", "active_quiz_sessions", {"user_id": "probe"}, None),
+    ("quiz_stats_by_user", "quiz_stats", {"user_id": "probe"}, None),
+    ("quiz_leaderboard", "quiz_stats", {}, [("best_percentage", DESCENDING), ("total_score", DESCENDING)]),
+    ("quiz_history_by_user", "quiz_attempts", {"user_id": "probe"}, [("created_at", DESCENDING)]),
+]
+
+index_status = {"ready": False, "created": 0, "failed": []}
+
+# Idempotently create every index in INDEX_SPECS (or only the named ones); failures are logged, not fatal.
+# Readiness only waits for the first full pass: a conflicting legacy index (codes 85/86) or duplicate data
+# blocking a unique index needs an operator, so it is reported in index_status and retried in the background
+async def ensure_indexes(only: Optional[List[str]] = None):
+    created = 0
+    failed = []
+    for collection_name, models in INDEX_SPECS.items():
+        for model in models:
+            name = f"{collection_name}.{model.document['name']}"
+            if only is not None and name not in only:
+                continue
+            try:
+                await db[collection_name].create_indexes([model])
+                created += 1
+            except OperationFailure as e:
+                # Typically duplicate data blocking a unique index, or an index with the same name and different options
+                failed.append(name)
+                logging.error(f"Failed to create index {name} (code {e.code}): {str(e)}")
+    index_status.update({"ready": True, "created": index_status["created"] + created, "failed": failed})
+    logger.info(f"Ensured {created} indexes ({len(failed)} failed)")
+
+# Retry indexes that failed during warm-up until they all exist
+async def retry_failed_indexes():
+    while index_status["failed"]:
+        await asyncio.sleep(INDEX_RETRY_SECONDS)
+        try:
+            await ensure_indexes(only=index_status["failed"])
+        except Exception as e:
+            logger.error(f"Index retry failed: {str(e)}")
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = []
+    while plan:
+        stages.append(plan.get("stage", "?"))
+        if "inputStage" in plan:
+            plan = plan["inputStage"]
+        elif plan.get("inputStages"):
+            for child in plan["inputStages"]:
+                stages.extend(_plan_stages(child))
+            break
+        else:
+            break
+    return stages
+
+# Report the winning plan of each hot query so collection scans are caught early
+async def explain_hot_queries() -> List[dict]:
+    report = []
+    for name, collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query, {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explanation = await cursor.explain()
+        except Exception as e:
+            report.append({"query": name, "collection": collection_name, "error": str(e)})
+            continue
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan.get("queryPlan", winning_plan))
+        report.append({
+            "query": name,
+            "collection": collection_name,
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return report
+
 # Seed plants data
+# Bump when SEED_PLANTS changes; every deployment upserts the new entries by name once
+PLANT_SEED_VERSION = 1
+
+SEED_PLANTS = [
+    {
+        "name": "Tomato",
+        "botanical_name": "Solanum lycopersicum",
+        "description": "A popular vegetable that's easy to grow and produces abundant fruit. Perfect for beginners.",
+        "sunlight": "High",
+        "water": "Medium",
+        "soil": "Well-draining, rich in organic matter",
+        "difficulty": "Easy",
+        "growing_time": "60-80 days",
+        "harvest_season": "Summer to Fall",
+        "care_tips": [
+            "Stake or cage plants for support",
+            "Water consistently to prevent blossom end rot",
+            "Prune suckers for better fruit production",
+            "Feed with balanced fertilizer every 2 weeks"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1592921870789-04563d55041c?w=400",
+        "category": "Vegetable"
+    },
+    {
+        "name": "Lettuce",
+        "botanical_name": "Lactuca sativa",
+        "description": "Quick-growing leafy green that thrives in cool weather. Harvest continuously for fresh salads.",
+        "sunlight": "Medium",
+        "water": "Medium",
+        "soil": "Loose, well-draining with compost",
+        "difficulty": "Easy",
+        "growing_time": "30-45 days",
+        "harvest_season": "Spring and Fall",
+        "care_tips": [
+            "Plant in succession for continuous harvest",
+            "Keep soil consistently moist",
+            "Harvest outer leaves first",
+            "Provide shade in hot weather"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1622206151226-18ca2c9ab4a1?w=400",
+        "category": "Vegetable"
+    },
+    {
+        "name": "Bell Pepper",
+        "botanical_name": "Capsicum annuum",
+        "description": "Colorful, sweet peppers that add flavor to any dish. Grows well in warm conditions.",
+        "sunlight": "High",
+        "water": "Medium",
+        "soil": "Well-draining, nutrient-rich",
+        "difficulty": "Medium",
+        "growing_time": "60-90 days",
+        "harvest_season": "Summer to Fall",
+        "care_tips": [
+            "Start indoors 8-10 weeks before last frost",
+            "Support plants with stakes",
+            "Water deeply but infrequently",
+            "Harvest when fruit reaches full size"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1563565375-f3fdfdbefa83?w=400",
+        "category": "Vegetable"
+    },
+    {
+        "name": "Basil",
+        "botanical_name": "Ocimum basilicum",
+        "description": "Aromatic herb essential for Italian cooking. Grows quickly and provides abundant leaves.",
+        "sunlight": "High",
+        "water": "Medium",
+        "soil": "Well-draining, moist",
+        "difficulty": "Easy",
+        "growing_time": "30-40 days",
+        "harvest_season": "Spring to Fall",
+        "care_tips": [
+            "Pinch off flowers to promote leaf growth",
+            "Harvest regularly to encourage bushiness",
+            "Water at the base to prevent mildew",
+            "Bring indoors before first frost"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1618375569909-3c8616cf7733?w=400",
+        "category": "Herb"
+    },
+    {
+        "name": "Strawberry",
+        "botanical_name": "Fragaria × ananassa",
+        "description": "Sweet, juicy berries that are perfect for containers or garden beds. Produces runners for propagation.",
+        "sunlight": "High",
+        "water": "Medium",
+        "soil": "Slightly acidic, well-draining",
+        "difficulty": "Easy",
+        "growing_time": "60-120 days",
+        "harvest_season": "Late Spring to Early Summer",
+        "care_tips": [
+            "Mulch around plants to keep berries clean",
+            "Remove runners for larger fruit",
+            "Fertilize after first harvest",
+            "Protect from birds with netting"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1464965911861-746a04b4bca6?w=400",
+        "category": "Fruit"
+    },
+    {
+        "name": "Carrot",
+        "botanical_name": "Daucus carota",
+        "description": "Crunchy root vegetable that grows well in loose soil. Great for containers with deep pots.",
+        "sunlight": "High",
+        "water": "Low",
+        "soil": "Loose, sandy, rock-free",
+        "difficulty": "Medium",
+        "growing_time": "70-80 days",
+        "harvest_season": "Spring and Fall",
+        "care_tips": [
+            "Thin seedlings to 2-3 inches apart",
+            "Keep soil consistently moist",
+            "Avoid fresh manure in soil",
+            "Harvest when shoulders emerge"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1598170845058-32b9d6a5da37?w=400",
+        "category": "Vegetable"
+    },
+    {
+        "name": "Mint",
+        "botanical_name": "Mentha",
+        "description": "Vigorous herb with refreshing aroma. Grows aggressively and is best contained.",
+        "sunlight": "Medium",
+        "water": "High",
+        "soil": "Moist, well-draining",
+        "difficulty": "Easy",
+        "growing_time": "40-50 days",
+        "harvest_season": "Spring to Fall",
+        "care_tips": [
+            "Grow in containers to control spread",
+            "Harvest regularly to prevent flowering",
+            "Water frequently",
+            "Divide plants every 2-3 years"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1628556270448-4d4e4148e1b1?w=400",
+        "category": "Herb"
+    },
+    {
+        "name": "Cucumber",
+        "botanical_name": "Cucumis sativus",
+        "description": "Refreshing vegetable that grows on vines. Produces abundantly with proper care.",
+        "sunlight": "High",
+        "water": "High",
+        "soil": "Rich, well-draining",
+        "difficulty": "Easy",
+        "growing_time": "50-70 days",
+        "harvest_season": "Summer",
+        "care_tips": [
+            "Provide trellis for vertical growth",
+            "Water deeply and consistently",
+            "Harvest frequently for more production",
+            "Mulch to retain moisture"
+        ],
+        "image_url": "https://images.unsplash.com/photo-1604977042946-1eecc30f269e?w=400",
+        "category": "Vegetable"
+    }
+]
+
+# Upsert SEED_PLANTS by name unless this seed version was already applied
 async def seed_plants():
-    count = await db.plants.count_documents({})
-    if count > 0:
+    stamp = await db.catalog_versions.find_one({"name": "plants"}, {"_id": 0, "seed_version": 1})
+    if stamp and stamp.get("seed_version", 0) >= PLANT_SEED_VERSION:
         return
-    
-    plants_data = [
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Tomato",
-            "botanical_name": "Solanum lycopersicum",
-            "description": "A popular vegetable that's easy to grow and produces abundant fruit. Perfect for beginners.",
-            "sunlight": "High",
-            "water": "Medium",
-            "soil": "Well-draining, rich in organic matter",
-            "difficulty": "Easy",
-            "growing_time": "60-80 days",
-            "harvest_season": "Summer to Fall",
-            "care_tips": [
-                "Stake or cage plants for support",
-                "Water consistently to prevent blossom end rot",
-                "Prune suckers for better fruit production",
-                "Feed with balanced fertilizer every 2 weeks"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1592921870789-04563d55041c?w=400",
-            "category": "Vegetable"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Lettuce",
-            "botanical_name": "Lactuca sativa",
-            "description": "Quick-growing leafy green that thrives in cool weather. Harvest continuously for fresh salads.",
-            "sunlight": "Medium",
-            "water": "Medium",
-            "soil": "Loose, well-draining with compost",
-            "difficulty": "Easy",
-            "growing_time": "30-45 days",
-            "harvest_season": "Spring and Fall",
-            "care_tips": [
-                "Plant in succession for continuous harvest",
-                "Keep soil consistently moist",
-                "Harvest outer leaves first",
-                "Provide shade in hot weather"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1622206151226-18ca2c9ab4a1?w=400",
-            "category": "Vegetable"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Bell Pepper",
-            "botanical_name": "Capsicum annuum",
-            "description": "Colorful, sweet peppers that add flavor to any dish. Grows well in warm conditions.",
-            "sunlight": "High",
-            "water": "Medium",
-            "soil": "Well-draining, nutrient-rich",
-            "difficulty": "Medium",
-            "growing_time": "60-90 days",
-            "harvest_season": "Summer to Fall",
-            "care_tips": [
-                "Start indoors 8-10 weeks before last frost",
-                "Support plants with stakes",
-                "Water deeply but infrequently",
-                "Harvest when fruit reaches full size"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1563565375-f3fdfdbefa83?w=400",
-            "category": "Vegetable"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Basil",
-            "botanical_name": "Ocimum basilicum",
-            "description": "Aromatic herb essential for Italian cooking. Grows quickly and provides abundant leaves.",
-            "sunlight": "High",
-            "water": "Medium",
-            "soil": "Well-draining, moist",
-            "difficulty": "Easy",
-            "growing_time": "30-40 days",
-            "harvest_season": "Spring to Fall",
-            "care_tips": [
-                "Pinch off flowers to promote leaf growth",
-                "Harvest regularly to encourage bushiness",
-                "Water at the base to prevent mildew",
-                "Bring indoors before first frost"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1618375569909-3c8616cf7733?w=400",
-            "category": "Herb"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Strawberry",
-            "botanical_name": "Fragaria × ananassa",
-            "description": "Sweet, juicy berries that are perfect for containers or garden beds. Produces runners for propagation.",
-            "sunlight": "High",
-            "water": "Medium",
-            "soil": "Slightly acidic, well-draining",
-            "difficulty": "Easy",
-            "growing_time": "60-120 days",
-            "harvest_season": "Late Spring to Early Summer",
-            "care_tips": [
-                "Mulch around plants to keep berries clean",
-                "Remove runners for larger fruit",
-                "Fertilize after first harvest",
-                "Protect from birds with netting"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1464965911861-746a04b4bca6?w=400",
-            "category": "Fruit"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Carrot",
-            "botanical_name": "Daucus carota",
-            "description": "Crunchy root vegetable that grows well in loose soil. Great for containers with deep pots.",
-            "sunlight": "High",
-            "water": "Low",
-            "soil": "Loose, sandy, rock-free",
-            "difficulty": "Medium",
-            "growing_time": "70-80 days",
-            "harvest_season": "Spring and Fall",
-            "care_tips": [
-                "Thin seedlings to 2-3 inches apart",
-                "Keep soil consistently moist",
-                "Avoid fresh manure in soil",
-                "Harvest when shoulders emerge"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1598170845058-32b9d6a5da37?w=400",
-            "category": "Vegetable"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Mint",
-            "botanical_name": "Mentha",
-            "description": "Vigorous herb with refreshing aroma. Grows aggressively and is best contained.",
-            "sunlight": "Medium",
-            "water": "High",
-            "soil": "Moist, well-draining",
-            "difficulty": "Easy",
-            "growing_time": "40-50 days",
-            "harvest_season": "Spring to Fall",
-            "care_tips": [
-                "Grow in containers to control spread",
-                "Harvest regularly to prevent flowering",
-                "Water frequently",
-                "Divide plants every 2-3 years"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1628556270448-4d4e4148e1b1?w=400",
-            "category": "Herb"
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Cucumber",
-            "botanical_name": "Cucumis sativus",
-            "description": "Refreshing vegetable that grows on vines. Produces abundantly with proper care.",
-            "sunlight": "High",
-            "water": "High",
-            "soil": "Rich, well-draining",
-            "difficulty": "Easy",
-            "growing_time": "50-70 days",
-            "harvest_season": "Summer",
-            "care_tips": [
-                "Provide trellis for vertical growth",
-                "Water deeply and consistently",
-                "Harvest frequently for more production",
-                "Mulch to retain moisture"
-            ],
-            "image_url": "https://images.unsplash.com/photo-1604977042946-1eecc30f269e?w=400",
-            "category": "Vegetable"
-        }
+
+    operations = [
+        UpdateOne(
+            {"name": plant["name"]},
+            {"$set": plant, "$setOnInsert": {"id": str(uuid.uuid4())}},
+            upsert=True
+        )
+        for plant in SEED_PLANTS
     ]
-    
-    await db.plants.insert_many(plants_data)
-    logging.info("Plants seeded successfully")
+    try:
+        result = await db.plants.bulk_write(operations, ordered=False)
+        upserted, modified = result.upserted_count, result.modified_count
+    except BulkWriteError as e:
+        # Another worker seeding concurrently wins the unique name index; its writes are equivalent
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        upserted, modified = e.details.get("nUpserted", 0), e.details.get("nModified", 0)
+    await db.catalog_versions.update_one({"name": "plants"}, {"$max": {"seed_version": PLANT_SEED_VERSION}}, upsert=True)
+    await bump_catalog_version()
+    logging.info(f"Plants seeded to version {PLANT_SEED_VERSION} ({upserted} added, {modified} updated)")
 
 # Auth endpoints
 @api_router.post("/auth/signup", response_model=TokenResponse)
@@ -333,14 +1411,14 @@ async def signup(user_data: UserCreate):
         "id": user_id,
         "name": user_data.name,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await password_hasher.hash(user_data.password),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
     await db.users.insert_one(user_doc)
     
     # Generate token
-    token = create_access_token(user_id)
+    token = create_access_token(user_id, user_doc)
     
     return TokenResponse(
         access_token=token,
@@ -353,13 +1431,13 @@ async def signup(user_data: UserCreate):
         )
     )
 
-@api_router.post("/auth/login", response_model=TokenResponse)
+@api_router.post("/auth/login", response_model=TokenResponse, dependencies=[Depends(rate_limit_by_ip("login"))])
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password"]):
+    if not user or not await password_hasher.verify(credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    token = create_access_token(user["id"])
+    token = create_access_token(user["id"], user)
     
     return TokenResponse(
         access_token=token,
@@ -381,43 +1459,766 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         created_at=current_user["created_at"]
     )
 
+# Plant catalog snapshot
+# Record a catalog change so every worker reloads its snapshot; call after any write to plants
+async def bump_catalog_version():
+    await db.catalog_versions.update_one(
+        {"name": "plants"}, {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}}, upsert=True
+    )
+
+def json_bytes(value) -> bytes:
+    if FAST_JSON_RESPONSES:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Serialize data the server wrote itself without re-validating it through response_model
+def trusted_json_response(value, headers: Optional[dict] = None):
+    if not FAST_JSON_RESPONSES:
+        return value
+    return Response(content=json_bytes(value), media_type="application/json", headers=headers)
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+SEARCH_TOKEN_PATTERN = re.compile(r"[0-9a-z]+")
+PLANT_FIELDS = set(Plant.model_fields)
+
+def search_tokens(text: str) -> List[str]:
+    return SEARCH_TOKEN_PATTERN.findall(text.lower())
+
+def encode_cursor(sort_key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, plant_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(name), str(plant_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Read-mostly snapshot of the plants collection
+class PlantCatalog:
+    SEARCH_FIELDS = ("name", "botanical_name", "description")
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.version = None
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.plants = []
+        self.serialized = []
+        self.sort_keys = []
+        self.by_id = {}
+        self.groups = {}
+        self.lists = {}
+        self.terms = []
+        self.postings = {}
+        self.empty_list = (b"[]", etag_for(b"[]"))
+        self.loads = 0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _dumps(value) -> bytes:
+        return json_bytes(value)
+
+    def _join(self, positions) -> bytes:
+        return b"[" + b",".join(self.serialized[p] for p in positions) + b"]"
+
+    async def _current_version(self):
+        doc = await db.catalog_versions.find_one({"name": "plants"}, {"_id": 0, "version": 1})
+        return doc["version"] if doc else 0
+
+    async def load(self):
+        async with self._lock:
+            version = await self._current_version()
+            docs = await db.plants.find({}, {"_id": 0}).to_list(None)
+            plants = sorted((Plant(**doc).model_dump() for doc in docs), key=lambda p: (p["name"].lower(), p["id"]))
+            serialized = [self._dumps(plant) for plant in plants]
+
+            groups = {}
+            postings = {}
+            for position, plant in enumerate(plants):
+                for key in (
+                    (None, None),
+                    (plant["category"], None),
+                    (None, plant["difficulty"]),
+                    (plant["category"], plant["difficulty"]),
+                ):
+                    groups.setdefault(key, []).append(position)
+                for field in self.SEARCH_FIELDS:
+                    for token in search_tokens(plant[field]):
+                        postings.setdefault(token, set()).add(position)
+
+            self.plants, self.serialized = plants, serialized
+            self.sort_keys = [(plant["name"].lower(), plant["id"]) for plant in plants]
+            self.by_id = {plant["id"]: (body, etag_for(body)) for plant, body in zip(plants, serialized)}
+            self.groups = groups
+            self.lists = {}
+            for key, positions in groups.items():
+                body = self._join(positions)
+                self.lists[key] = (body, etag_for(body))
+            self.postings = postings
+            self.terms = sorted(postings)
+            self.version = version
+            self.loaded_at = self.checked_at = time.monotonic()
+            self.loads += 1
+
+    async def ensure_fresh(self):
+        if self.version is None:
+            await self.load()
+            return
+        if time.monotonic() - self.checked_at < self.refresh_seconds:
+            return
+        self.checked_at = time.monotonic()
+        if await self._current_version() != self.version:
+            await self.load()
+
+    def invalidate(self):
+        self.checked_at = 0.0
+
+    # Positions matching every query token as a prefix of some indexed word
+    def _search(self, text: str) -> set:
+        matched = None
+        for token in search_tokens(text):
+            hits = set()
+            index = bisect_left(self.terms, token)
+            while index < len(self.terms) and self.terms[index].startswith(token):
+                hits |= self.postings[self.terms[index]]
+                index += 1
+            matched = hits if matched is None else matched & hits
+            if not matched:
+                return set()
+        return matched if matched is not None else set()
+
+    async def list_plants(self, category: Optional[str], difficulty: Optional[str]) -> tuple:
+        await self.ensure_fresh()
+        return self.lists.get((category or None, difficulty or None), self.empty_list)
+
+    # Returns (body, etag, next_cursor) for a filtered, searched and paginated page
+    async def query_plants(
+        self,
+        category: Optional[str],
+        difficulty: Optional[str],
+        search: Optional[str],
+        cursor: Optional[str],
+        limit: Optional[int],
+        fields: Optional[List[str]]
+    ) -> tuple:
+        await self.ensure_fresh()
+        positions = self.groups.get((category or None, difficulty or None), [])
+        if search and search.strip():
+            matched = self._search(search)
+            if len(matched) < len(positions):
+                category, difficulty = category or None, difficulty or None
+                positions = [
+                    p for p in sorted(matched)
+                    if (category is None or self.plants[p]["category"] == category)
+                    and (difficulty is None or self.plants[p]["difficulty"] == difficulty)
+                ]
+            else:
+                positions = [p for p in positions if p in matched]
+
+        start = 0
+        if cursor:
+            start = bisect_right(positions, decode_cursor(cursor), key=lambda p: self.sort_keys[p])
+        end = len(positions) if limit is None else start + limit
+        page = positions[start:end]
+        next_cursor = encode_cursor(self.sort_keys[page[-1]]) if page and end < len(positions) else None
+
+        if fields:
+            body = self._dumps([{field: self.plants[p][field] for field in fields} for p in page])
+        else:
+            body = self._join(page)
+        return body, etag_for(body), next_cursor
+
+    async def get_plant(self, plant_id: str) -> Optional[tuple]:
+        await self.ensure_fresh()
+        return self.by_id.get(plant_id)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "plants": len(self.plants),
+            "filter_combinations": len(self.lists),
+            "search_terms": len(self.terms),
+            "loads": self.loads,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+plant_catalog = PlantCatalog(CATALOG_REFRESH_SECONDS)
+
+# Cross-worker cache invalidation
+def seconds_since(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - moment).total_seconds())
+
+# Keeps every worker's plant catalog and user cache coherent; the polling fallback only follows the plants counter
+class CacheInvalidationBus:
+    WATCHED = ("plants", "users")
+
+    def __init__(self, mode: str, poll_interval: float):
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.active_mode = None
+        self.resume_token = None
+        self.version = None
+        self.changes = {name: 0 for name in self.WATCHED}
+        self.full_resets = 0
+        self.errors = 0
+        self.catalog_reloads = 0
+        self.last_change_at = None
+        self.lag = {name: LatencyTracker() for name in self.WATCHED}
+        self._task = None
+        self._reload_task = None
+        self._catalog_dirty = False
+
+    def start(self):
+        if self.mode != "off" and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._reload_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._reload_task = None
+
+    async def _run(self):
+        if self.mode in ("auto", "change_stream"):
+            try:
+                await self._watch()
+            except Exception as e:
+                # Only reached when the first stream cannot be opened, e.g. code 40573 on a standalone server
+                level = logging.WARNING if self.mode == "change_stream" else logging.INFO
+                logging.log(level, f"Change streams unavailable, polling version counters instead: {str(e)}")
+        self.active_mode = "poll"
+        await self._poll()
+
+    async def _watch(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.WATCHED)}}}]
+        delay = 1.0
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup", resume_after=self.resume_token) as stream:
+                    self.active_mode = "change_stream"
+                    delay = 1.0
+                    async for change in stream:
+                        self._apply_change(change)
+                        self.resume_token = stream.resume_token
+            except OperationFailure as e:
+                if self.active_mode is None:
+                    raise
+                # Usually an expired resume token: start over and drop whatever may have changed meanwhile
+                self.errors += 1
+                logging.error(f"Change stream failed, restarting without resume token: {str(e)}")
+                self.resume_token = None
+                self._reset_all()
+            except PyMongoError as e:
+                self.errors += 1
+                logging.error(f"Change stream interrupted, resuming in {delay:.0f}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    def _apply_change(self, change: dict):
+        collection = change["ns"]["coll"]
+        self.changes[collection] += 1
+        if collection == "plants":
+            self._reload_catalog()
+        else:
+            user_id = (change.get("fullDocument") or {}).get("id")
+            if user_id is not None:
+                invalidate_cached_user(user_id)
+            else:
+                # Delete events carry only _id, and the cache is keyed by the user id field
+                user_cache.clear()
+        written_at = change.get("wallTime")
+        if written_at is None and change.get("clusterTime") is not None:
+            written_at = change["clusterTime"].as_datetime()
+        self._observe_lag(collection, "change_stream", written_at)
+
+    async def _poll(self):
+        while True:
+            try:
+                doc = await db.catalog_versions.find_one({"name": "plants"}, {"_id": 0, "version": 1, "updated_at": 1})
+                # A counter nobody has bumped yet is version 0, so its first bump is not mistaken for the baseline
+                self._apply_version(doc or {"version": 0})
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Cache invalidation poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _apply_version(self, doc: dict):
+        version = doc.get("version", 0)
+        previous, self.version = self.version, version
+        if previous is None or version == previous:
+            # The first poll only records a baseline; the catalog was just loaded
+            return
+        self.changes["plants"] += max(version - previous, 1)
+        self._reload_catalog()
+        self._observe_lag("plants", "poll", doc.get("updated_at"))
+
+    def _observe_lag(self, collection: str, source: str, written_at: Optional[datetime]):
+        self.last_change_at = time.time()
+        if written_at is None:
+            return
+        lag = seconds_since(written_at)
+        self.lag[collection].observe(lag)
+        CACHE_INVALIDATION_LAG.observe(lag, collection, source)
+
+    def _reset_users(self):
+        self.full_resets += 1
+        user_cache.clear()
+
+    def _reset_all(self):
+        self._reset_users()
+        self._reload_catalog()
+
+    # Reload the snapshot once per burst of plant changes, however many events arrive
+    def _reload_catalog(self):
+        self._catalog_dirty = True
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._reload_loop())
+
+    async def _reload_loop(self):
+        while self._catalog_dirty:
+            self._catalog_dirty = False
+            try:
+                # Unconditional: writers that bypass bump_catalog_version leave the version unchanged
+                await plant_catalog.load()
+                self.catalog_reloads += 1
+            except Exception as e:
+                self.errors += 1
+                plant_catalog.invalidate()
+                logging.error(f"Catalog reload after invalidation failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.active_mode or ("off" if self.mode == "off" else "starting"),
+            "changes": dict(self.changes),
+            "catalog_reloads": self.catalog_reloads,
+            "full_resets": self.full_resets,
+            "errors": self.errors,
+            "seconds_since_last_change": round(time.time() - self.last_change_at, 1) if self.last_change_at else None,
+            "lag": {name: tracker.snapshot() for name, tracker in self.lag.items()},
+        }
+
+cache_invalidation_bus = CacheInvalidationBus(CACHE_INVALIDATION_MODE, CACHE_INVALIDATION_POLL_SECONDS)
+
+def cached_json_response(body: bytes, etag: str, if_none_match: Optional[str], headers: Optional[dict] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **(headers or {})}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # Plants endpoints
 @api_router.get("/plants", response_model=List[Plant])
-async def get_plants(category: Optional[str] = None, difficulty: Optional[str] = None):
-    query = {}
-    if category:
-        query["category"] = category
-    if difficulty:
-        query["difficulty"] = difficulty
-    
-    plants = await db.plants.find(query, {"_id": 0}).to_list(1000)
-    return plants
+async def get_plants(
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    search: Optional[str] = Query(None, max_length=100),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of Plant fields"),
+    limit: Optional[int] = Query(None, ge=1, le=PLANTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    if_none_match: Optional[str] = Header(None)
+):
+    # Unpaginated, unprojected requests are served from the precomputed full lists
+    if not (search or fields or limit or cursor):
+        body, etag = await plant_catalog.list_plants(category, difficulty)
+        return cached_json_response(body, etag, if_none_match)
+
+    selected_fields = None
+    if fields:
+        selected_fields = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected_fields if f not in PLANT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if limit is None and cursor:
+        limit = PLANTS_DEFAULT_PAGE_SIZE
+
+    body, etag, next_cursor = await plant_catalog.query_plants(
+        category, difficulty, search, cursor, limit, selected_fields
+    )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return cached_json_response(body, etag, if_none_match, headers)
 
 @api_router.get("/plants/{plant_id}", response_model=Plant)
-async def get_plant(plant_id: str):
-    plant = await db.plants.find_one({"id": plant_id}, {"_id": 0})
-    if not plant:
+async def get_plant(plant_id: str, if_none_match: Optional[str] = Header(None)):
+    entry = await plant_catalog.get_plant(plant_id)
+    if not entry:
         raise HTTPException(status_code=404, detail="Plant not found")
-    return plant
+    body, etag = entry
+    return cached_json_response(body, etag, if_none_match)
 
-# Plant identification endpoint
-@api_router.post("/identify-plant", response_model=PlantIdentificationResponse)
-async def identify_plant(
-    request: PlantIdentificationRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    try:
-        # Initialize LLM chat
-        chat = LlmChat(
+# LLM gateway
+# Raised when the model cannot be reached within budget; status_code is 503 or 504
+class LlmUnavailableError(Exception):
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+# Raised when the model answered but no reply within the re-prompt budget was usable
+class LlmOutputError(LlmUnavailableError):
+    def __init__(self, message: str):
+        super().__init__(message, status_code=502)
+
+TRANSIENT_LLM_ERROR_MARKERS = ("timeout", "timed out", "rate limit", "429", "500", "502", "503", "504", "overloaded", "connection", "temporarily")
+
+def is_transient_llm_error(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in TRANSIENT_LLM_ERROR_MARKERS)
+
+# Import the LLM client on first use; its dependency tree dominates cold-start import time
+def llm_client_types() -> tuple:
+    from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+    return LlmChat, UserMessage, ImageContent
+
+# Adapts the LLM client to the plain text and base64 interface LlmGateway expects of any chat
+class EmergentChat:
+    def __init__(self, system_message: str):
+        LlmChat, self.user_message, self.image_content = llm_client_types()
+        self.chat = LlmChat(
             api_key=EMERGENT_LLM_KEY,
             session_id=str(uuid.uuid4()),
-            system_message="You are a plant identification expert. Analyze plant images and provide detailed identification and care instructions. Respond in JSON format."
-        ).with_model("openai", "gpt-5.1")
-        
-        # Create message with image
-        image_content = ImageContent(image_base64=request.image_base64)
-        user_message = UserMessage(
-            text="""Identify this plant and provide care instructions. Respond in this exact JSON format:
+            system_message=system_message
+        ).with_model(LLM_PROVIDER, LLM_MODEL)
+        if hasattr(self.chat, "stream_message"):
+            self.stream_message = self._stream_message
+
+    async def send_message(self, text: str, image_base64: Optional[str] = None) -> str:
+        if image_base64:
+            message = self.user_message(text=text, file_contents=[self.image_content(image_base64=image_base64)])
+        else:
+            message = self.user_message(text=text)
+        return await self.chat.send_message(message)
+
+    def _stream_message(self, text: str):
+        return self.chat.stream_message(self.user_message(text=text))
+
+def default_chat_factory(system_message: str):
+    return EmergentChat(system_message)
+
+# Single entry point for model calls: concurrency cap, deadlines, retries, coalescing and a circuit breaker
+class LlmGateway:
+    def __init__(self, max_concurrency: int, timeout: float, max_retries: int, base_delay: float,
+                 breaker_threshold: int, breaker_cooldown: float, chat_factory=default_chat_factory):
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.chat_factory = chat_factory
+        self.in_flight = {}
+        self.active = 0
+        self.waiting = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.slot_timeouts = 0
+        self.short_circuited = 0
+        self.latency = LatencyTracker()
+
+    def _check_breaker(self):
+        remaining = self.open_until - time.monotonic()
+        if remaining > 0:
+            self.short_circuited += 1
+            raise LlmUnavailableError("AI service is temporarily unavailable, please retry shortly", 503, remaining)
+
+    def _record_success(self):
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def _record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.breaker_threshold:
+            self.open_until = time.monotonic() + self.breaker_cooldown
+            logging.error(f"LLM circuit breaker open for {self.breaker_cooldown}s after {self.consecutive_failures} failures")
+
+    async def _acquire_slot(self, timeout: float):
+        # Waiting on our own concurrency cap says nothing about upstream health, so it never trips the breaker
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=max(0.0, timeout))
+        except asyncio.TimeoutError:
+            self.slot_timeouts += 1
+            raise LlmUnavailableError("AI service is busy, please retry shortly", 503)
+        finally:
+            self.waiting -= 1
+
+    async def _call_once(self, system_message: str, text: str, image_base64: Optional[str], deadline: float) -> str:
+        await self._acquire_slot(deadline - time.monotonic())
+        self.active += 1
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            chat = self.chat_factory(system_message)
+            response = await asyncio.wait_for(
+                chat.send_message(text, image_base64), timeout=max(0.0, deadline - time.monotonic())
+            )
+            outcome = "ok"
+            return response
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latency.observe(elapsed)
+            LLM_CALL_DURATION.observe(elapsed, outcome)
+            self.active -= 1
+            self.semaphore.release()
+
+    async def _call(self, system_message: str, text: str, image_base64: Optional[str]) -> str:
+        self._check_breaker()
+        self.calls += 1
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            try:
+                response = await self._call_once(system_message, text, image_base64, deadline)
+                self._record_success()
+                return response
+            except LlmUnavailableError:
+                raise
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._record_failure()
+                raise LlmUnavailableError("AI service timed out, please try again", 504)
+            except Exception as e:
+                transient = is_transient_llm_error(e)
+                delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if not transient or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    # One failure per logical call, however many attempts it took
+                    self._record_failure()
+                    raise
+                attempt += 1
+                self.retries += 1
+                logging.warning(f"Transient LLM error, retry {attempt}/{self.max_retries} in {delay:.2f}s: {str(e)}")
+                await asyncio.sleep(delay)
+                self._check_breaker()
+
+    async def send(self, system_message: str, text: str, image_base64: Optional[str] = None, coalesce: bool = False) -> str:
+        if not coalesce:
+            return await self._call(system_message, text, image_base64)
+
+        key = hashlib.sha256(
+            "\x00".join([system_message, text, image_base64 or ""]).encode("utf-8")
+        ).hexdigest()
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # A task of its own, so one caller going away does not cancel the call for the others
+            task = asyncio.create_task(self._call(system_message, text, image_base64))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish_shared(key, done))
+        return await asyncio.shield(task)
+
+    def _finish_shared(self, key: str, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody is still waiting for is not reported as never retrieved
+            task.exception()
+
+    # Yield the reply text as the model produces it
+    async def stream(self, system_message: str, text: str):
+        chat = self.chat_factory(system_message)
+        if not hasattr(chat, "stream_message"):
+            yield await self._call(system_message, text, None)
+            return
+
+        self._check_breaker()
+        self.calls += 1
+        await self._acquire_slot(self.timeout)
+        self.active += 1
+        started = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            chunks = chat.stream_message(text).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+            outcome = "ok"
+            self._record_success()
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            self.timeouts += 1
+            self._record_failure()
+            raise LlmUnavailableError("AI service timed out, please try again", 504)
+        except Exception:
+            outcome = "error"
+            self._record_failure()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latency.observe(elapsed)
+            LLM_CALL_DURATION.observe(elapsed, outcome)
+            self.active -= 1
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "coalescing": len(self.in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "slot_timeouts": self.slot_timeouts,
+            "short_circuited": self.short_circuited,
+            "breaker_open": self.open_until > time.monotonic(),
+            "latency": self.latency.snapshot(),
+        }
+
+llm_gateway = LlmGateway(
+    LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY_SECONDS,
+    LLM_BREAKER_THRESHOLD,
+    LLM_BREAKER_COOLDOWN_SECONDS
+)
+
+def llm_unavailable_exception(error: LlmUnavailableError) -> HTTPException:
+    headers = {"Retry-After": str(max(1, int(error.retry_after or 1)))} if error.status_code == 503 else None
+    return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+
+# Structured LLM output
+JSON_FENCE_PATTERN = re.compile(r"```[ \t]*(?:json)?[ \t]*\n?(.*?)```", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+SMART_QUOTES = str.maketrans({"\u201c": '"', "\u201d": '"', "\u2018": "'", "\u2019": "'"})
+REPROMPT_INSTRUCTION = "Your previous reply could not be used ({error}). Reply again with only the JSON object, without markdown fences or commentary."
+
+llm_output_stats = {"parsed": 0, "repaired": 0, "reprompted": 0, "failed": 0}
+
+# Walk from text[start] to the end of its value. Returns (end index or None, unclosed brackets, inside string)
+def scan_json(text: str, start: int) -> tuple:
+    closers = []
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+            if not closers:
+                return index + 1, [], False
+    return None, closers, in_string
+
+# Fenced blocks first, then the first balanced object or array, then the whole reply
+def json_candidates(text: str) -> List[str]:
+    candidates = [block.strip() for block in JSON_FENCE_PATTERN.findall(text)]
+    # The outermost value starts at whichever bracket comes first
+    for start in sorted(index for index in (text.find("{"), text.find("[")) if index != -1):
+        end, _, _ = scan_json(text, start)
+        candidates.append(text[start:end] if end else text[start:])
+    candidates.append(text.strip())
+    return [candidate for candidate in dict.fromkeys(candidates) if candidate]
+
+# Fix the defects models commonly produce: smart or single quotes, trailing commas, truncation
+def repair_json(text: str) -> str:
+    if '"' not in text:
+        text = text.translate(SMART_QUOTES)
+        if '"' not in text:
+            text = text.replace("'", '"')
+    text = TRAILING_COMMA_PATTERN.sub(r"\1", text)
+    _, closers, in_string = scan_json(text, 0)
+    if in_string:
+        text += '"'
+    if closers:
+        text = text.rstrip().rstrip(",") + "".join(reversed(closers))
+    return TRAILING_COMMA_PATTERN.sub(r"\1", text)
+
+# Extract JSON from a model reply. Returns (value, repaired); raises LlmOutputError
+def parse_llm_json(text: str) -> tuple:
+    candidates = json_candidates(text or "")
+    for candidate in candidates:
+        try:
+            return json.loads(candidate), False
+        except ValueError:
+            pass
+    for candidate in candidates:
+        try:
+            return json.loads(repair_json(candidate), strict=False), True
+        except ValueError:
+            pass
+    raise LlmOutputError("Model reply contained no parseable JSON")
+
+def parse_identification(text: str) -> tuple:
+    value, repaired = parse_llm_json(text)
+    try:
+        return PlantIdentificationResult.model_validate(value).model_dump(), repaired
+    except ValidationError as e:
+        fields = ", ".join(".".join(str(part) for part in error["loc"]) or "reply" for error in e.errors())
+        raise LlmOutputError(f"Identification reply is missing or has invalid fields: {fields}")
+
+def parse_quiz_questions(text: str) -> tuple:
+    value, repaired = parse_llm_json(text)
+    raw = value.get("questions") if isinstance(value, dict) else value
+    if not isinstance(raw, list):
+        raise LlmOutputError("Quiz reply has no questions list")
+    questions = [question for question in map(validate_quiz_question, raw) if question]
+    if not questions:
+        raise LlmOutputError("Quiz reply contained no valid questions")
+    return questions, repaired
+
+# Send prompt and return parse(reply)[0], re-prompting up to LLM_OUTPUT_MAX_REPROMPTS times
+async def request_structured(system_message: str, prompt: str, parse: Callable, image_base64: Optional[str] = None, coalesce: bool = False):
+    reply = await llm_gateway.send(system_message, prompt, image_base64, coalesce=coalesce)
+    for attempt in range(LLM_OUTPUT_MAX_REPROMPTS + 1):
+        try:
+            value, repaired = parse(reply)
+        except LlmOutputError as e:
+            if attempt == LLM_OUTPUT_MAX_REPROMPTS:
+                llm_output_stats["failed"] += 1
+                raise
+            llm_output_stats["reprompted"] += 1
+            logging.warning(f"Unusable model reply, re-prompting: {str(e)}")
+            reply = await llm_gateway.send(
+                system_message, f"{prompt}\n\n{REPROMPT_INSTRUCTION.format(error=e)}", image_base64
+            )
+            continue
+        llm_output_stats["repaired" if repaired else "parsed"] += 1
+        return value
+
+# Plant identification
+IDENTIFY_SYSTEM_MESSAGE = "You are a plant identification expert. Analyze plant images and provide detailed identification and care instructions. Respond in JSON format."
+IDENTIFY_PROMPT = """Identify this plant and provide care instructions. Respond in this exact JSON format:
 {
   "plant_name": "common name",
   "botanical_name": "scientific name",
@@ -429,73 +2230,771 @@ async def identify_plant(
     "temperature": "ideal temperature range",
     "tips": ["tip1", "tip2", "tip3"]
   }
-}""",
-            file_contents=[image_content]
-        )
-        
-        # Get AI response
-        response = await chat.send_message(user_message)
-        
-        # Parse response
-        import json
+}"""
+
+def decode_image_base64(image_base64: str) -> bytes:
+    if image_base64.startswith("data:") and "," in image_base64:
+        image_base64 = image_base64.split(",", 1)[1]
+    try:
+        return base64.b64decode(image_base64, validate=False)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid base64 image data")
+
+# 64-bit difference hash; visually identical photos land within a few bits
+def perceptual_hash(image: Image.Image) -> int:
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+FEATURE_EDGE = 128
+COLOR_BINS = (12, 4, 4)  # hue, saturation, value
+TEXTURE_BINS = (8, 8)  # gradient orientation, gradient magnitude
+COLOR_WEIGHT = 0.7
+
+# Colour and texture histogram embedding; the dot product of two is a weighted Bhattacharyya coefficient
+def image_features(image: Image.Image) -> np.ndarray:
+    image = ImageOps.fit(image.convert("RGB"), (FEATURE_EDGE, FEATURE_EDGE), Image.BILINEAR)
+    hsv = np.asarray(image.convert("HSV"), dtype=np.int32)
+    hue, saturation, value = (hsv[..., channel] * bins >> 8 for channel, bins in enumerate(COLOR_BINS))
+    color = np.bincount(
+        ((hue * COLOR_BINS[1] + saturation) * COLOR_BINS[2] + value).ravel(),
+        minlength=int(np.prod(COLOR_BINS))
+    ).astype(np.float32)
+
+    gray = np.asarray(image.convert("L"), dtype=np.float32)
+    gx = np.diff(gray, axis=1)[:-1, :]
+    gy = np.diff(gray, axis=0)[:, :-1]
+    magnitude = np.hypot(gx, gy)
+    orientation = np.minimum((np.mod(np.arctan2(gy, gx), np.pi) / np.pi * TEXTURE_BINS[0]).astype(np.int32), TEXTURE_BINS[0] - 1)
+    strength = np.minimum((magnitude / 8).astype(np.int32), TEXTURE_BINS[1] - 1)
+    texture = np.bincount(
+        (orientation * TEXTURE_BINS[1] + strength).ravel(),
+        minlength=int(np.prod(TEXTURE_BINS))
+    ).astype(np.float32)
+
+    # Square roots of unit-sum histograms have unit L2 norm, so the blend stays normalized
+    return np.concatenate([
+        np.sqrt(COLOR_WEIGHT * color / max(color.sum(), 1.0)),
+        np.sqrt((1 - COLOR_WEIGHT) * texture / max(texture.sum(), 1.0)),
+    ])
+
+# Validates and shrinks uploaded photos before they are sent to the model
+class ImagePipeline:
+    STAGES = ("decode", "orient", "resize", "encode", "fingerprint", "features")
+
+    def __init__(self, max_edge: int, output_format: str, quality: int, workers: int, extract_features: bool = False):
+        self.max_edge = max_edge
+        self.extract_features = extract_features
+        self.output_format = output_format if output_format in ("JPEG", "WEBP") else "JPEG"
+        self.quality = quality
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image")
+        self.stage_latency = {stage: LatencyTracker() for stage in self.STAGES}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rejected = 0
+
+    def _process(self, image_bytes: bytes) -> dict:
+        timings = {}
+        mark = time.perf_counter()
+
+        def lap(stage: str):
+            nonlocal mark
+            now = time.perf_counter()
+            timings[stage] = now - mark
+            mark = now
+
         try:
-            result = json.loads(response)
-        except:
-            # If response is not JSON, create a structured response
-            result = {
-                "plant_name": "Unknown Plant",
-                "botanical_name": "Analysis in progress",
-                "confidence": "medium",
-                "care_instructions": {
-                    "sunlight": response[:100] if len(response) > 100 else response,
-                    "water": "Keep soil moderately moist",
-                    "soil": "Well-draining potting mix",
-                    "temperature": "65-75°F (18-24°C)",
-                    "tips": ["Monitor plant health regularly", "Adjust care based on plant response"]
-                }
-            }
-        
-        # Save identification
-        identification_id = str(uuid.uuid4())
-        identification_doc = {
-            "id": identification_id,
-            "user_id": current_user["id"],
-            "plant_name": result.get("plant_name", "Unknown"),
-            "botanical_name": result.get("botanical_name", "N/A"),
-            "confidence": result.get("confidence", "medium"),
-            "care_instructions": result.get("care_instructions", {}),
-            "identified_at": datetime.now(timezone.utc).isoformat()
+            image = Image.open(io.BytesIO(image_bytes))
+            if image.format not in IMAGE_ALLOWED_FORMATS:
+                raise ValueError(f"Unsupported image format: {image.format}")
+            image.draft("RGB", (self.max_edge, self.max_edge))
+            image.load()
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            return {"error": str(e) or "Unreadable image"}
+        lap("decode")
+
+        image = ImageOps.exif_transpose(image)
+        lap("orient")
+
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        if max(image.size) > self.max_edge:
+            image.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+        lap("resize")
+
+        # Saving without an exif argument drops all metadata
+        output = io.BytesIO()
+        image.save(output, format=self.output_format, quality=self.quality, optimize=True)
+        normalized = output.getvalue()
+        lap("encode")
+
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        phash = perceptual_hash(image)
+        lap("fingerprint")
+
+        features = None
+        if self.extract_features:
+            features = image_features(image)
+            lap("features")
+
+        return {
+            "image_bytes": normalized,
+            "sha256": sha256,
+            "phash": phash,
+            "features": features,
+            "size": image.size,
+            "timings": timings,
         }
-        
-        await db.plant_identifications.insert_one(identification_doc)
-        
-        return PlantIdentificationResponse(
-            id=identification_id,
-            plant_name=result.get("plant_name", "Unknown"),
-            botanical_name=result.get("botanical_name"),
-            confidence=result.get("confidence", "medium"),
-            care_instructions=result.get("care_instructions", {}),
-            identified_at=identification_doc["identified_at"]
+
+    async def prepare(self, image_bytes: bytes) -> dict:
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(self.executor, self._process, image_bytes)
+        if "error" in prepared:
+            self.rejected += 1
+            raise HTTPException(status_code=400, detail=f"Invalid image: {prepared['error']}")
+        for stage, seconds in prepared["timings"].items():
+            self.stage_latency[stage].observe(seconds)
+            IMAGE_STAGE_DURATION.observe(seconds, stage)
+        self.bytes_in += len(image_bytes)
+        self.bytes_out += len(prepared["image_bytes"])
+        return prepared
+
+    def stats(self) -> dict:
+        return {
+            "max_edge": self.max_edge,
+            "output_format": self.output_format,
+            "quality": self.quality,
+            "rejected": self.rejected,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "stages": {stage: tracker.snapshot() for stage, tracker in self.stage_latency.items()},
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+image_pipeline = ImagePipeline(
+    IMAGE_MAX_EDGE, IMAGE_OUTPUT_FORMAT, IMAGE_OUTPUT_QUALITY, IMAGE_PIPELINE_WORKERS, LOCAL_CLASSIFIER_ENABLED
+)
+
+REFERENCE_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+def reference_slug(name: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "-", name.lower()).strip("-")
+
+# An identification result answered from the catalog entry instead of the model
+def catalog_identification(plant: dict) -> dict:
+    return {
+        "plant_name": plant["name"],
+        "botanical_name": plant["botanical_name"],
+        "confidence": "high",
+        "care_instructions": {
+            "sunlight": f"{plant['sunlight']} sunlight",
+            "water": f"{plant['water']} watering",
+            "soil": plant["soil"],
+            "tips": plant["care_tips"],
+        },
+        "source": "catalog",
+        "plant_id": plant["id"],
+    }
+
+# Nearest-neighbour pre-classifier over catalog reference images
+class LocalPlantClassifier:
+    def __init__(self, enabled: bool, reference_dir: Path, fetch_images: bool, min_similarity: float, min_margin: float):
+        self.enabled = enabled
+        self.reference_dir = reference_dir
+        self.fetch_images = fetch_images
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.names = []
+        self.label_index = np.zeros(0, dtype=np.int64)
+        self.built_at = None
+        self.matched = 0
+        self.escalated = 0
+        self.latency = LatencyTracker()
+
+    def _load_references(self, names: List[str]) -> tuple:
+        rows, labels = [], []
+        for name in names:
+            folder = self.reference_dir / reference_slug(name)
+            if not folder.is_dir():
+                continue
+            for path in sorted(folder.iterdir()):
+                if path.suffix.lower() not in REFERENCE_IMAGE_SUFFIXES:
+                    continue
+                try:
+                    with Image.open(path) as image:
+                        rows.append(image_features(ImageOps.exif_transpose(image)))
+                    labels.append(name)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Skipping reference image {path}: {str(e)}")
+        return rows, labels
+
+    async def _fetch_missing(self, plants: List[dict]):
+        import httpx
+
+        async with httpx.AsyncClient(timeout=15, follow_redirects=True) as http:
+            for plant in plants:
+                folder = self.reference_dir / reference_slug(plant["name"])
+                if not plant.get("image_url") or (folder.is_dir() and any(folder.iterdir())):
+                    continue
+                try:
+                    response = await http.get(plant["image_url"])
+                    response.raise_for_status()
+                    folder.mkdir(parents=True, exist_ok=True)
+                    (folder / "catalog.jpg").write_bytes(response.content)
+                except (httpx.HTTPError, OSError) as e:
+                    logging.warning(f"Could not fetch reference image for {plant['name']}: {str(e)}")
+
+    async def build(self):
+        if not self.enabled:
+            return
+        try:
+            await plant_catalog.ensure_fresh()
+            plants = list(plant_catalog.plants)
+            if self.fetch_images:
+                await self._fetch_missing(plants)
+            rows, labels = await asyncio.to_thread(self._load_references, [plant["name"] for plant in plants])
+        except Exception as e:
+            logging.error(f"Local classifier build failed: {str(e)}")
+            return
+        self.names = sorted(set(labels))
+        self.label_index = np.array([self.names.index(label) for label in labels], dtype=np.int64)
+        self.matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        self.built_at = datetime.now(timezone.utc).isoformat()
+        logging.info(f"Local classifier built from {len(rows)} reference images for {len(self.names)} plants")
+
+    # Return a catalog identification for a confident match, or None to escalate to the model
+    def classify(self, features: Optional[np.ndarray]) -> Optional[dict]:
+        if features is None or not self.matrix.size:
+            return None
+        started = time.perf_counter()
+        scores = self.matrix @ features
+        best = np.full(len(self.names), -1.0, dtype=np.float32)
+        np.maximum.at(best, self.label_index, scores)
+        order = np.argsort(best)[::-1]
+        top = float(best[order[0]])
+        runner_up = float(best[order[1]]) if len(order) > 1 else 0.0
+        self.latency.observe(time.perf_counter() - started)
+
+        plant = None
+        if top >= self.min_similarity and top - runner_up >= self.min_margin:
+            plant = next((p for p in plant_catalog.plants if p["name"] == self.names[order[0]]), None)
+        if plant is None:
+            self.escalated += 1
+            return None
+        self.matched += 1
+        return catalog_identification(plant)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "reference_images": int(self.matrix.shape[0]),
+            "plants": len(self.names),
+            "built_at": self.built_at,
+            "min_similarity": self.min_similarity,
+            "min_margin": self.min_margin,
+            "matched": self.matched,
+            "escalated": self.escalated,
+            "latency": self.latency.snapshot(),
+        }
+
+local_classifier = LocalPlantClassifier(
+    LOCAL_CLASSIFIER_ENABLED,
+    LOCAL_CLASSIFIER_REFERENCE_DIR,
+    LOCAL_CLASSIFIER_FETCH_IMAGES,
+    LOCAL_CLASSIFIER_MIN_SIMILARITY,
+    LOCAL_CLASSIFIER_MIN_MARGIN
+)
+
+# Ask the model to identify a plant; raises LlmOutputError if no reply fits PlantIdentificationResult
+async def request_llm_identification(image_base64: str) -> dict:
+    return await request_structured(
+        IDENTIFY_SYSTEM_MESSAGE, IDENTIFY_PROMPT, parse_identification, image_base64, coalesce=True
+    )
+
+# Resolve an identification from the cache or the model. Returns (result, cached)
+async def identify_image(image_bytes: bytes) -> tuple:
+    return await identify_prepared(await image_pipeline.prepare(image_bytes))
+
+# Like identify_image for an image that already went through the pipeline; on_stage is awaited before the model call
+async def identify_prepared(prepared: dict, on_stage: Optional[Callable] = None) -> tuple:
+    sha256, phash = prepared["sha256"], prepared["phash"]
+    cached = await identification_cache.lookup(sha256, phash)
+    if cached is not None:
+        return cached, True
+
+    # Confident matches for catalog plants are answered on-box without a model call
+    match = local_classifier.classify(prepared["features"])
+    if match is not None:
+        return match, False
+
+    if on_stage:
+        await on_stage("identifying")
+    image_base64 = base64.b64encode(prepared["image_bytes"]).decode("ascii")
+    result = await request_llm_identification(image_base64)
+    await identification_cache.store(sha256, phash, result)
+    return result, False
+
+def identification_document(current_user: dict, result: dict) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": current_user["id"],
+        "plant_name": result.get("plant_name", "Unknown"),
+        "botanical_name": result.get("botanical_name", "N/A"),
+        "confidence": result.get("confidence", "medium"),
+        "care_instructions": result.get("care_instructions", {}),
+        "source": result.get("source", "model"),
+        "identified_at": datetime.now(timezone.utc).isoformat()
+    }
+
+def identification_response(identification_doc: dict, result: dict, cached: bool) -> PlantIdentificationResponse:
+    return PlantIdentificationResponse(
+        id=identification_doc["id"],
+        plant_name=identification_doc["plant_name"],
+        botanical_name=result.get("botanical_name"),
+        confidence=identification_doc["confidence"],
+        care_instructions=identification_doc["care_instructions"],
+        identified_at=identification_doc["identified_at"],
+        cached=cached,
+        source=identification_doc["source"]
+    )
+
+SUMMARY_RECENT_FIELDS = ("id", "plant_name", "botanical_name", "confidence", "identified_at")
+
+def summary_key(plant_name: str) -> str:
+    # Field names inside update paths cannot contain "." or start with "$"
+    return hashlib.sha1(plant_name.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+# Fold new identifications into the user's summary document with a single atomic update
+async def update_identification_summary(user_id: str, identification_docs: List[dict]):
+    if not identification_docs:
+        return
+    increments = {"total": len(identification_docs)}
+    names = {}
+    for doc in identification_docs:
+        key = summary_key(doc["plant_name"])
+        increments[f"plants.{key}.count"] = increments.get(f"plants.{key}.count", 0) + 1
+        names[f"plants.{key}.plant_name"] = doc["plant_name"]
+    recent = sorted(
+        ({field: doc.get(field) for field in SUMMARY_RECENT_FIELDS} for doc in identification_docs),
+        key=lambda entry: entry["identified_at"]
+    )
+    # Upserted summaries are not backfilled yet, so the next read rebuilds them from the full history
+    increments["revision"] = 1
+    await db.identification_summaries.update_one(
+        {"user_id": user_id},
+        {
+            "$inc": increments,
+            "$set": names,
+            "$push": {"recent": {"$each": recent, "$slice": -IDENTIFICATION_SUMMARY_RECENT}}
+        },
+        upsert=True
+    )
+
+# Save await build() as the user's backfilled rollup unless an incremental update landed meanwhile;
+# keep names fields that only the incremental path can produce and are carried over as stored
+async def store_rebuilt_rollup(collection: str, user_id: str, build, keep: tuple = ()) -> dict:
+    for _ in range(3):
+        current = await db[collection].find_one(
+            {"user_id": user_id}, {"_id": 0, "revision": 1, **{field: 1 for field in keep}}
         )
-        
+        # Records are queued before their incremental update, so this flush covers everything already counted
+        await write_behind.flush()
+        rollup = {**await build(), "user_id": user_id, "backfilled": True}
+        rollup.update({field: current[field] for field in keep if current and field in current})
+        if current is None:
+            try:
+                await db[collection].insert_one(dict(rollup))
+                return rollup
+            except DuplicateKeyError:
+                continue
+        rollup["revision"] = current.get("revision")
+        result = await db[collection].replace_one({"user_id": user_id, "revision": current.get("revision")}, rollup)
+        if result.matched_count:
+            return rollup
+    # Still racing with writes: serve the fresh rebuild and leave the stored copy for the next read
+    return rollup
+
+async def rebuild_identification_summary(user_id: str) -> dict:
+    async def build():
+        facets = await db.plant_identifications.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "plants": [{"$group": {"_id": "$plant_name", "count": {"$sum": 1}}}],
+                "recent": [
+                    {"$sort": {"identified_at": -1, "id": -1}},
+                    {"$limit": IDENTIFICATION_SUMMARY_RECENT},
+                    {"$project": {"_id": 0, **{field: 1 for field in SUMMARY_RECENT_FIELDS}}}
+                ]
+            }}
+        ]).to_list(1)
+        facet = facets[0] if facets else {"plants": [], "recent": []}
+        return {
+            "total": sum(group["count"] for group in facet["plants"]),
+            "plants": {
+                summary_key(group["_id"] or "Unknown"): {"plant_name": group["_id"] or "Unknown", "count": group["count"]}
+                for group in facet["plants"]
+            },
+            "recent": list(reversed(facet["recent"]))
+        }
+
+    return await store_rebuilt_rollup("identification_summaries", user_id, build)
+
+async def save_identification(current_user: dict, result: dict, cached: bool = False) -> PlantIdentificationResponse:
+    identification_doc = identification_document(current_user, result)
+    await write_behind.insert("plant_identifications", identification_doc)
+    await update_identification_summary(current_user["id"], [identification_doc])
+    return identification_response(identification_doc, result, cached)
+
+async def identify_and_save(current_user: dict, image_bytes: bytes) -> PlantIdentificationResponse:
+    try:
+        result, cached = await identify_image(image_bytes)
+        return await save_identification(current_user, result, cached)
+    except HTTPException:
+        raise
+    except LlmUnavailableError as e:
+        raise llm_unavailable_exception(e)
     except Exception as e:
         logging.error(f"Plant identification error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to identify plant: {str(e)}")
 
-# Quiz endpoints
-@api_router.get("/quiz/generate", response_model=QuizGenerateResponse)
-async def generate_quiz(current_user: dict = Depends(get_current_user)):
+# Asynchronous identification jobs
+JOB_TERMINAL_STATUSES = ("completed", "failed")
+
+# In-process queue and worker pool for ?async=1 identifications
+class IdentificationJobQueue:
+    def __init__(self, workers: int, queue_size: int, ttl_seconds: int):
+        self.worker_count = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.ttl_seconds = ttl_seconds
+        self.subscribers = {}
+        self.workers = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.job_latency = LatencyTracker()
+
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        # Image bytes die with the process, so anything still queued cannot be resumed
+        while not self.queue.empty():
+            job_id, _, _, _ = self.queue.get_nowait()
+            await self._update(job_id, {"status": "failed", "stage": "failed", "error": "Server restarted before the job ran"})
+
+    def _check_capacity(self):
+        if self.queue.full():
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Identification queue is full, please retry shortly", headers={"Retry-After": "5"})
+
+    async def submit(self, current_user: dict, image_bytes: bytes) -> dict:
+        self._check_capacity()
+        # Queue the downscaled image, not the upload: a full queue of raw 15MB photos would pin gigabytes
+        prepared = await image_pipeline.prepare(image_bytes)
+        self._check_capacity()
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": current_user["id"],
+            "status": "queued",
+            "stage": "queued",
+            "result": None,
+            "error": None,
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "expires_at": now + timedelta(seconds=self.ttl_seconds)
+        }
+        await db.identification_jobs.insert_one(dict(job))
+        self.queue.put_nowait((job["id"], current_user, prepared, time.perf_counter()))
+        self.submitted += 1
+        return job
+
+    async def _update(self, job_id: str, changes: dict):
+        changes = {**changes, "updated_at": datetime.now(timezone.utc).isoformat()}
+        await db.identification_jobs.update_one({"id": job_id}, {"$set": changes})
+        for subscriber in self.subscribers.get(job_id, []):
+            subscriber.put_nowait(changes)
+
+    async def _worker(self):
+        while True:
+            job_id, current_user, prepared, enqueued = await self.queue.get()
+            try:
+                await self._update(job_id, {"status": "processing", "stage": "started"})
+
+                async def on_stage(stage: str):
+                    await self._update(job_id, {"stage": stage})
+
+                result, cached = await identify_prepared(prepared, on_stage)
+                identification = await save_identification(current_user, result, cached)
+                await self._update(job_id, {"status": "completed", "stage": "completed", "result": identification.model_dump()})
+                self.completed += 1
+            except asyncio.CancelledError:
+                await self._update(job_id, {"status": "failed", "stage": "failed", "error": "Server restarted while the job was running"})
+                raise
+            except Exception as e:
+                if isinstance(e, HTTPException):
+                    error = e.detail
+                elif isinstance(e, LlmUnavailableError):
+                    error = str(e)
+                else:
+                    logging.error(f"Plant identification job {job_id} error: {str(e)}")
+                    error = f"Failed to identify plant: {str(e)}"
+                await self._update(job_id, {"status": "failed", "stage": "failed", "error": error})
+                self.failed += 1
+            finally:
+                self.job_latency.observe(time.perf_counter() - enqueued)
+                self.queue.task_done()
+
+    async def get(self, job_id: str, user_id: str) -> dict:
+        job = await db.identification_jobs.find_one({"id": job_id, "user_id": user_id}, {"_id": 0, "expires_at": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    # Yield SSE frames until the job reaches a terminal status
+    async def events(self, job: dict):
+        yield f"event: status\ndata: {json.dumps(job)}\n\n"
+        if job["status"] in JOB_TERMINAL_STATUSES:
+            return
+        subscriber = asyncio.Queue()
+        self.subscribers.setdefault(job["id"], []).append(subscriber)
+        try:
+            while True:
+                try:
+                    changes = await asyncio.wait_for(subscriber.get(), timeout=IDENTIFY_JOB_POLL_SECONDS)
+                    job = {**job, **changes}
+                except asyncio.TimeoutError:
+                    # The job may be running in another worker process; fall back to polling
+                    latest = await db.identification_jobs.find_one({"id": job["id"]}, {"_id": 0, "expires_at": 0})
+                    if not latest or latest == job:
+                        yield ": keep-alive\n\n"
+                        continue
+                    job = latest
+                yield f"event: status\ndata: {json.dumps(job)}\n\n"
+                if job["status"] in JOB_TERMINAL_STATUSES:
+                    return
+        finally:
+            subscribers = self.subscribers.get(job["id"], [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self.subscribers.pop(job["id"], None)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.worker_count,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "stream_subscribers": sum(len(s) for s in self.subscribers.values()),
+            "job_latency": self.job_latency.snapshot(),
+        }
+
+identification_jobs = IdentificationJobQueue(IDENTIFY_JOB_WORKERS, IDENTIFY_JOB_QUEUE_SIZE, IDENTIFY_JOB_TTL_SECONDS)
+
+async def identify_or_enqueue(current_user: dict, image_bytes: bytes, run_async: bool):
+    if not run_async:
+        return await identify_and_save(current_user, image_bytes)
+    job = await identification_jobs.submit(current_user, image_bytes)
+    return JSONResponse(status_code=202, content={
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/identify-plant/jobs/{job['id']}",
+        "events_url": f"/api/identify-plant/jobs/{job['id']}/events"
+    })
+
+@api_router.post(
+    "/identify-plant",
+    response_model=PlantIdentificationResponse,
+    dependencies=[Depends(rate_limit("identify", "llm_global"))]
+)
+async def identify_plant(
+    request: PlantIdentificationRequest,
+    run_async: bool = Query(False, alias="async", description="Queue the identification and return a job id"),
+    current_user: dict = Depends(get_current_user)
+):
+    image_bytes = decode_image_base64(request.image_base64)
+    return await identify_or_enqueue(current_user, image_bytes, run_async)
+
+@api_router.get("/identify-plant/jobs/{job_id}")
+async def get_identification_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return await identification_jobs.get(job_id, current_user["id"])
+
+@api_router.get("/identify-plant/jobs/{job_id}/events")
+async def stream_identification_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await identification_jobs.get(job_id, current_user["id"])
+    return StreamingResponse(
+        identification_jobs.events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Read a multipart upload in chunks, refusing anything over max_bytes
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Please upload an image file")
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image exceeds the {max_bytes // (1024 * 1024)}MB upload limit")
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Uploaded image is empty")
+    return bytes(buffer)
+
+@api_router.post(
+    "/identify-plant/upload",
+    response_model=PlantIdentificationResponse,
+    dependencies=[Depends(rate_limit("identify", "llm_global"))]
+)
+async def identify_plant_upload(
+    file: UploadFile = File(...),
+    run_async: bool = Query(False, alias="async", description="Queue the identification and return a job id"),
+    current_user: dict = Depends(get_current_user)
+):
+    # Starlette spools multipart files over 1MB to disk, so only the capped read lives in memory
     try:
-        # Initialize LLM chat
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are a gardening education expert. Generate quiz questions about soil types, plant care, and general gardening knowledge. Respond only in valid JSON format."
-        ).with_model("openai", "gpt-5.1")
-        
-        user_message = UserMessage(
-            text="""Generate 5 multiple-choice questions about gardening, focusing on soil types and general plant care. 
-Respond in this exact JSON format:
+        image_bytes = await read_upload(file, IDENTIFY_UPLOAD_MAX_BYTES)
+    finally:
+        await file.close()
+    return await identify_or_enqueue(current_user, image_bytes, run_async)
+
+# Identify several photos in one request
+@api_router.post(
+    "/identify-plants/batch",
+    response_model=BatchIdentificationResponse,
+    dependencies=[Depends(rate_limit("identify_batch"))]
+)
+async def identify_plants_batch(
+    files: List[UploadFile] = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    if len(files) > IDENTIFY_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {IDENTIFY_BATCH_MAX_IMAGES} images per batch")
+
+    items = [BatchIdentificationItem(index=i, filename=f.filename, status="pending") for i, f in enumerate(files)]
+    first_by_hash = {}
+    unique = []
+    for item, file in zip(items, files):
+        try:
+            image_bytes = await read_upload(file, IDENTIFY_UPLOAD_MAX_BYTES)
+        except HTTPException as e:
+            item.status, item.error = "error", e.detail
+            continue
+        finally:
+            await file.close()
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        if digest in first_by_hash:
+            item.duplicate_of = first_by_hash[digest]
+            continue
+        first_by_hash[digest] = item.index
+        unique.append((item, image_bytes))
+
+    # Each unique photo may cost a model call
+    if unique:
+        await rate_limiter.check("llm_global", "all", cost=len(unique))
+
+    semaphore = asyncio.Semaphore(max(1, IDENTIFY_BATCH_CONCURRENCY))
+
+    async def identify_one(image_bytes: bytes):
+        async with semaphore:
+            return await identify_image(image_bytes)
+
+    outcomes = await asyncio.gather(*(identify_one(image_bytes) for _, image_bytes in unique), return_exceptions=True)
+
+    documents = []
+    for (item, _), outcome in zip(unique, outcomes):
+        if isinstance(outcome, BaseException):
+            item.status = "error"
+            if isinstance(outcome, HTTPException):
+                item.error = outcome.detail
+            elif isinstance(outcome, LlmUnavailableError):
+                item.error = str(outcome)
+            else:
+                logging.error(f"Batch identification error: {str(outcome)}")
+                item.error = f"Failed to identify plant: {str(outcome)}"
+            continue
+        result, cached = outcome
+        identification_doc = identification_document(current_user, result)
+        documents.append(identification_doc)
+        item.status = "ok"
+        item.identification = identification_response(identification_doc, result, cached)
+
+    if documents:
+        await db.plant_identifications.insert_many(documents)
+        await update_identification_summary(current_user["id"], documents)
+
+    for item in items:
+        if item.duplicate_of is not None:
+            original = items[item.duplicate_of]
+            item.status, item.identification, item.error = original.status, original.identification, original.error
+
+    succeeded = sum(1 for item in items if item.status == "ok")
+    return BatchIdentificationResponse(results=items, succeeded=succeeded, failed=len(items) - succeeded)
+
+# Identification history endpoints
+@api_router.get("/identifications", response_model=IdentificationPage)
+async def get_identifications(
+    limit: int = Query(IDENTIFICATIONS_DEFAULT_PAGE_SIZE, ge=1, le=IDENTIFICATIONS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_care: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    query = {"user_id": current_user["id"]}
+    if cursor:
+        identified_at, identification_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"identified_at": {"$lt": identified_at}},
+            {"identified_at": identified_at, "id": {"$lt": identification_id}}
+        ]
+    projection = {"_id": 0, **{field: 1 for field in SUMMARY_RECENT_FIELDS}}
+    if include_care:
+        projection["care_instructions"] = 1
+
+    # Fetch one extra row to know whether another page exists
+    docs = await db.plant_identifications.find(query, projection).sort(
+        [("identified_at", DESCENDING), ("id", DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    pending = write_behind.pending_for("plant_identifications", current_user["id"])
+    if pending and cursor:
+        pending = [doc for doc in pending if (doc["identified_at"], doc["id"]) < (identified_at, identification_id)]
+    docs = merge_pending(docs, pending, projection, ("identified_at", "id"), limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor((docs[-1]["identified_at"], docs[-1]["id"]))
+    return trusted_json_response({"items": docs, "next_cursor": next_cursor})
+
+@api_router.get("/identifications/summary", response_model=IdentificationSummary)
+async def get_identification_summary(current_user: dict = Depends(get_current_user)):
+    summary = await db.identification_summaries.find_one({"user_id": current_user["id"]}, {"_id": 0})
+    if summary is None or not summary.get("backfilled"):
+        summary = await rebuild_identification_summary(current_user["id"])
+    plants = sorted(summary.get("plants", {}).values(), key=lambda p: (-p["count"], p["plant_name"]))
+    return IdentificationSummary(
+        total=summary.get("total", 0),
+        plants=plants,
+        recent=list(reversed(summary.get("recent", [])))
+    )
+
+# Quiz question generation
+QUIZ_SYSTEM_MESSAGE = "You are a gardening education expert. Generate quiz questions about soil types, plant care, and general gardening knowledge. Respond only in valid JSON format."
+QUIZ_RESPONSE_FORMAT = """Respond in this exact JSON format:
 {
   "questions": [
     {
@@ -505,63 +3004,563 @@ Respond in this exact JSON format:
     }
   ]
 }"""
+
+# Generate questions; only validated ones are returned, and at least one or LlmOutputError is raised
+async def request_llm_quiz_questions(subject: str, count: int) -> List[dict]:
+    return await request_structured(
+        QUIZ_SYSTEM_MESSAGE,
+        f"Generate {count} multiple-choice questions about gardening, focusing on {subject}. \n{QUIZ_RESPONSE_FORMAT}",
+        parse_quiz_questions
+    )
+
+# "B", "(b)", "B) Sandy" or "b. Sandy" referring to the second option
+ANSWER_LETTER_PATTERN = re.compile(r"^\(?([a-z])(?:[).:]\s*|\s+|$)(.*)$", re.IGNORECASE | re.DOTALL)
+
+# Return a clean question dict, or None if the model output is unusable
+def validate_quiz_question(raw: Any) -> Optional[dict]:
+    if isinstance(raw, dict) and isinstance(raw.get("options"), dict):
+        raw = {**raw, "options": list(raw["options"].values())}
+    try:
+        question = QuizQuestion(**raw)
+    except Exception:
+        return None
+    text = question.question.strip()
+    options = [option.strip() for option in question.options]
+    if not text or len(options) < 2 or any(not option for option in options):
+        return None
+    if len({option.lower() for option in options}) != len(options):
+        return None
+    answer = question.correct_answer.strip()
+    matches = [option for option in options if option.lower() == answer.lower()]
+    letter = ANSWER_LETTER_PATTERN.match(answer)
+    if not matches and letter:
+        index = ord(letter.group(1).lower()) - ord("a")
+        remainder = letter.group(2).strip().lower()
+        if index < len(options) and (not remainder or remainder == options[index].lower()):
+            matches = [options[index]]
+    if not matches:
+        return None
+    return {"question": text, "options": options, "correct_answer": matches[0]}
+
+# Pulls question objects out of a streamed {"questions": [...]} reply as soon as each one closes
+class QuizStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.element_start = None
+        self.element_depth = 0
+
+    def _element(self, raw: str) -> Optional[dict]:
+        for candidate in (raw, repair_json(raw)):
+            try:
+                return validate_quiz_question(json.loads(candidate, strict=False))
+            except ValueError:
+                continue
+        return None
+
+    def feed(self, chunk: str) -> List[dict]:
+        self.buffer += chunk
+        found = []
+        for index in range(self.position, len(self.buffer)):
+            char = self.buffer[index]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if char == "{" and self.element_start is None and self.stack and self.stack[-1] == "[":
+                    self.element_start, self.element_depth = index, len(self.stack)
+                self.stack.append(char)
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+                if char == "}" and self.element_start is not None and len(self.stack) == self.element_depth:
+                    question = self._element(self.buffer[self.element_start:index + 1])
+                    self.element_start = None
+                    if question:
+                        found.append(question)
+        self.position = len(self.buffer)
+        return found
+
+def question_fingerprint(question: dict) -> str:
+    normalized = " ".join(question["question"].lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+# Keeps a stock of validated, de-duplicated quiz questions per topic
+class QuizQuestionPool:
+    def __init__(self, topics: List[str], target: int, low_watermark: int, batch_size: int,
+                 max_serves: int, refill_interval: float, seen_history: int):
+        self.topics = topics
+        self.target = target
+        self.low_watermark = low_watermark
+        self.batch_size = batch_size
+        self.max_serves = max_serves
+        self.refill_interval = refill_interval
+        self.seen_history = seen_history
+        self.inventory = {topic: 0 for topic in topics}
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.refill_errors = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refill_errors += 1
+                logging.error(f"Quiz pool refill error: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def available_count(self, topic: str) -> int:
+        count = await db.quiz_question_bank.count_documents(
+            {"topic": topic, "served_count": {"$lt": self.max_serves}}
         )
-        
-        response = await chat.send_message(user_message)
-        
-        # Parse response
-        import json
-        result = json.loads(response)
-        
-        # Store quiz questions in session for later verification
-        quiz_session_id = str(uuid.uuid4())
-        await db.quiz_sessions.insert_one({
-            "id": quiz_session_id,
-            "user_id": current_user["id"],
-            "questions": result["questions"],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
-        
-        # Store quiz session ID in a temporary collection
-        await db.active_quiz_sessions.delete_many({"user_id": current_user["id"]})
-        await db.active_quiz_sessions.insert_one({
-            "user_id": current_user["id"],
-            "session_id": quiz_session_id
-        })
+        self.inventory[topic] = count
+        return count
+
+    async def refill(self):
+        for topic in self.topics:
+            available = await self.available_count(topic)
+            if available >= self.low_watermark:
+                continue
+            attempts = 0
+            # Bound the number of model calls so a misbehaving model cannot spin forever
+            while available < self.target and attempts < 2 * max(1, self.target // self.batch_size):
+                attempts += 1
+                questions = await request_llm_quiz_questions(topic, self.batch_size)
+                added, _ = await self.add_questions(topic, questions)
+                available += added
+            self.inventory[topic] = available
+
+    # Validate and upsert questions by fingerprint. Returns (new count, bank ids of all valid questions)
+    async def add_questions(self, topic: str, questions: List[Any]) -> tuple:
+        added = 0
+        ids = []
+        for raw in questions:
+            question = validate_quiz_question(raw)
+            if question is None:
+                self.invalid += 1
+                continue
+            fingerprint = question_fingerprint(question)
+            question_id = str(uuid.uuid4())
+            # ReturnDocument.BEFORE yields None exactly when this call inserted the question
+            existing = await db.quiz_question_bank.find_one_and_update(
+                {"fingerprint": fingerprint},
+                {"$setOnInsert": {
+                    "id": question_id,
+                    "fingerprint": fingerprint,
+                    "topic": topic,
+                    "served_count": 0,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    **question
+                }},
+                projection={"_id": 0, "id": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            if existing is None:
+                added += 1
+                self.generated += 1
+                ids.append(question_id)
+            else:
+                self.duplicates += 1
+                ids.append(existing["id"])
+        return added, ids
+
+    async def seen_question_ids(self, user_id: str) -> List[str]:
+        doc = await db.quiz_seen_questions.find_one({"user_id": user_id}, {"_id": 0, "question_ids": 1})
+        return doc["question_ids"] if doc else []
+
+    async def mark_seen(self, user_id: str, questions: List[dict]):
+        ids = [q["id"] for q in questions if q.get("id")]
+        if not ids:
+            return
+        await db.quiz_seen_questions.update_one(
+            {"user_id": user_id},
+            {"$push": {"question_ids": {"$each": ids, "$slice": -self.seen_history}}},
+            upsert=True
+        )
+        await db.quiz_question_bank.update_many({"id": {"$in": ids}}, {"$inc": {"served_count": 1}})
+
+    # Pick count questions the user has not seen recently, or None when the pool is dry
+    async def draw(self, user_id: str, count: int) -> Optional[List[dict]]:
+        seen = await self.seen_question_ids(user_id)
+        questions = await db.quiz_question_bank.aggregate([
+            {"$match": {"id": {"$nin": seen}, "served_count": {"$lt": self.max_serves}}},
+            {"$sample": {"size": count}},
+            {"$project": {"_id": 0, "id": 1, "topic": 1, "question": 1, "options": 1, "correct_answer": 1}}
+        ]).to_list(count)
+        if len(questions) < count:
+            self.misses += 1
+            self.wake()
+            return None
+        self.hits += 1
+        await self.mark_seen(user_id, questions)
+        if any(q["topic"] in self.inventory and self.inventory[q["topic"]] - 1 < self.low_watermark for q in questions):
+            self.wake()
+        return questions
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "inventory": dict(self.inventory),
+            "target": self.target,
+            "low_watermark": self.low_watermark,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "refill_errors": self.refill_errors,
+        }
+
+quiz_question_pool = QuizQuestionPool(
+    QUIZ_TOPICS,
+    QUIZ_POOL_TARGET,
+    QUIZ_POOL_LOW_WATERMARK,
+    QUIZ_POOL_BATCH_SIZE,
+    QUIZ_POOL_MAX_SERVES,
+    QUIZ_POOL_REFILL_INTERVAL_SECONDS,
+    QUIZ_SEEN_HISTORY
+)
+
+# Quiz endpoints
+@api_router.get(
+    "/quiz/generate",
+    response_model=QuizGenerateResponse,
+    dependencies=[Depends(rate_limit("quiz_generate", "llm_global"))]
+)
+async def generate_quiz(current_user: dict = Depends(get_current_user)):
+    try:
+        questions = None
+        if QUIZ_POOL_ENABLED:
+            questions = await quiz_question_pool.draw(current_user["id"], QUIZ_QUESTIONS_PER_QUIZ)
+
+        if questions is None:
+            # Pool is dry for this user: fall back to a live generation and bank the result
+            generated = await request_llm_quiz_questions("soil types and general plant care", QUIZ_QUESTIONS_PER_QUIZ)
+            # The model may write more than asked: serve the first ones and bank the rest for later quizzes
+            questions = generated[:QUIZ_QUESTIONS_PER_QUIZ]
+            if QUIZ_POOL_ENABLED:
+                _, bank_ids = await quiz_question_pool.add_questions("general", generated)
+                await quiz_question_pool.mark_seen(current_user["id"], [{"id": i} for i in bank_ids[:len(questions)]])
+
+        questions = [session_question(q) for q in questions]
+        quiz_session_id = await start_quiz_session(current_user["id"], questions)
         
         # Return questions without correct answers
-        questions_without_answers = [
-            {
-                "question": q["question"],
-                "options": q["options"],
-                "correct_answer": ""  # Hide correct answer from client
-            }
-            for q in result["questions"]
-        ]
+        questions_without_answers = [client_question(q) for q in questions]
         
-        return QuizGenerateResponse(questions=questions_without_answers)
+        return QuizGenerateResponse(questions=questions_without_answers, session_id=quiz_session_id)
         
+    except LlmUnavailableError as e:
+        raise llm_unavailable_exception(e)
     except Exception as e:
         logging.error(f"Quiz generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
 
+def session_question(question: dict) -> dict:
+    return {
+        "question": question["question"],
+        "options": question["options"],
+        "correct_answer": question["correct_answer"],
+        "topic": question.get("topic", "general")
+    }
+
+def client_question(question: dict) -> dict:
+    # Hide correct answer from client
+    return {"question": question["question"], "options": question["options"], "correct_answer": ""}
+
+# Make questions the user's single active session; replacing it supersedes any older quiz
+async def start_quiz_session(user_id: str, questions: List[dict]) -> str:
+    quiz_session_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    await db.active_quiz_sessions.find_one_and_replace(
+        {"user_id": user_id},
+        {
+            "user_id": user_id,
+            "session_id": quiz_session_id,
+            "questions": questions,
+            "created_at": now.isoformat(),
+            "expires_at": now + timedelta(seconds=QUIZ_SESSION_TTL_SECONDS)
+        },
+        projection={"_id": 1},
+        upsert=True
+    )
+    return quiz_session_id
+
+# Yield session-ready questions: all at once from the pool, else one by one as the model writes them
+async def stream_quiz_questions(current_user: dict):
+    if QUIZ_POOL_ENABLED:
+        questions = await quiz_question_pool.draw(current_user["id"], QUIZ_QUESTIONS_PER_QUIZ)
+        if questions is not None:
+            for question in questions:
+                yield session_question(question)
+            return
+
+    prompt = f"Generate {QUIZ_QUESTIONS_PER_QUIZ} multiple-choice questions about gardening, focusing on soil types and general plant care. \n{QUIZ_RESPONSE_FORMAT}"
+    parser = QuizStreamParser()
+    generated = []
+    seen = set()
+    async for chunk in llm_gateway.stream(QUIZ_SYSTEM_MESSAGE, prompt):
+        for question in parser.feed(chunk):
+            fingerprint = question_fingerprint(question)
+            if fingerprint in seen or len(generated) >= QUIZ_QUESTIONS_PER_QUIZ:
+                continue
+            seen.add(fingerprint)
+            generated.append(question)
+            yield session_question(question)
+
+    if not generated:
+        # Nothing usable streamed; the buffered path can still repair or re-prompt
+        generated = await request_llm_quiz_questions("soil types and general plant care", QUIZ_QUESTIONS_PER_QUIZ)
+        for question in generated:
+            yield session_question(question)
+    if QUIZ_POOL_ENABLED:
+        _, bank_ids = await quiz_question_pool.add_questions("general", generated)
+        await quiz_question_pool.mark_seen(current_user["id"], [{"id": i} for i in bank_ids])
+
+# Newline-delimited JSON events: session, then one question per question, then done or error
+@api_router.get("/quiz/generate/stream", dependencies=[Depends(rate_limit("quiz_generate", "llm_global"))])
+async def generate_quiz_stream(current_user: dict = Depends(get_current_user)):
+    user_id = current_user["id"]
+    quiz_session_id = await start_quiz_session(user_id, [])
+
+    async def events():
+        yield json.dumps({"type": "session", "session_id": quiz_session_id}) + "\n"
+        count = 0
+        try:
+            async for question in stream_quiz_questions(current_user):
+                result = await db.active_quiz_sessions.update_one(
+                    {"user_id": user_id, "session_id": quiz_session_id},
+                    {"$push": {"questions": question}}
+                )
+                if not result.matched_count:
+                    yield json.dumps({"type": "error", "status": 409, "detail": "Quiz was superseded or already submitted"}) + "\n"
+                    return
+                yield json.dumps({"type": "question", "index": count, "question": client_question(question)}) + "\n"
+                count += 1
+            yield json.dumps({"type": "done", "count": count}) + "\n"
+        except LlmUnavailableError as e:
+            yield json.dumps({"type": "error", "status": e.status_code, "detail": str(e)}) + "\n"
+        except Exception as e:
+            logging.error(f"Quiz stream error: {str(e)}")
+            yield json.dumps({"type": "error", "status": 500, "detail": f"Failed to generate quiz: {str(e)}"}) + "\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Quiz statistics
+def stats_key(name: str) -> str:
+    # Topic names become field names inside update paths
+    return re.sub(r"[.$]", "_", name) or "general"
+
+def streak_after(last_day: Optional[str], current_streak: int, today: str) -> int:
+    if last_day == today:
+        return current_streak
+    yesterday = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+    return current_streak + 1 if last_day == yesterday else 1
+
+# Fold one attempt into the user's quiz_stats document
+async def update_quiz_stats(current_user: dict, attempt_doc: dict, questions: List[dict]):
+    user_id = current_user["id"]
+    today = attempt_doc["created_at"][:10]
+    increments = {
+        "revision": 1,
+        "attempts": 1,
+        "total_score": attempt_doc["score"],
+        "total_questions": attempt_doc["total_questions"],
+        "total_percentage": attempt_doc["percentage"],
+    }
+    topic_names = {}
+    for question, answer in zip(questions, attempt_doc["answers"] + [None] * len(questions)):
+        key = stats_key(question.get("topic", "general"))
+        topic_names[f"topics.{key}.topic"] = question.get("topic", "general")
+        increments[f"topics.{key}.total"] = increments.get(f"topics.{key}.total", 0) + 1
+        correct = 1 if answer == question["correct_answer"] else 0
+        increments[f"topics.{key}.correct"] = increments.get(f"topics.{key}.correct", 0) + correct
+
+    before = await db.quiz_stats.find_one_and_update(
+        {"user_id": user_id},
+        {
+            "$inc": increments,
+            "$max": {"best_percentage": attempt_doc["percentage"], "best_score": attempt_doc["score"]},
+            "$set": {"name": current_user.get("name", ""), "last_attempt_at": attempt_doc["created_at"], **topic_names}
+        },
+        projection={"_id": 0, "last_attempt_day": 1, "current_streak": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    last_day = before.get("last_attempt_day") if before else None
+    if last_day == today:
+        return
+    streak = streak_after(last_day, (before or {}).get("current_streak", 0), today)
+    await db.quiz_stats.update_one(
+        {"user_id": user_id, "last_attempt_day": last_day},
+        {"$set": {"current_streak": streak, "last_attempt_day": today}, "$max": {"longest_streak": streak}}
+    )
+
+# Backfill quiz_stats from quiz_attempts for users who predate incremental stats
+async def rebuild_quiz_stats(current_user: dict) -> dict:
+    user_id = current_user["id"]
+
+    async def build():
+        facets = await db.quiz_attempts.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "totals": [{"$group": {
+                    "_id": None,
+                    "attempts": {"$sum": 1},
+                    "total_score": {"$sum": "$score"},
+                    "total_questions": {"$sum": "$total_questions"},
+                    "total_percentage": {"$sum": "$percentage"},
+                    "best_percentage": {"$max": "$percentage"},
+                    "best_score": {"$max": "$score"},
+                    "last_attempt_at": {"$max": "$created_at"}
+                }}],
+                "days": [{"$group": {"_id": {"$substr": ["$created_at", 0, 10]}}}]
+            }}
+        ]).to_list(1)
+        facet = facets[0] if facets else {"totals": [], "days": []}
+        totals = facet["totals"][0] if facet["totals"] else {}
+        totals.pop("_id", None)
+
+        current_streak = longest_streak = 0
+        last_day = None
+        for day in sorted(group["_id"] for group in facet["days"]):
+            current_streak = streak_after(last_day, current_streak, day)
+            longest_streak = max(longest_streak, current_streak)
+            last_day = day
+
+        return {
+            "name": current_user.get("name", ""),
+            "attempts": 0,
+            "total_score": 0,
+            "total_questions": 0,
+            "total_percentage": 0.0,
+            "best_percentage": 0.0,
+            "best_score": 0,
+            **totals,
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+            "last_attempt_day": last_day,
+            "topics": {}
+        }
+
+    # Attempts do not record question topics, so the per-topic breakdown cannot be rebuilt from them
+    return await store_rebuilt_rollup("quiz_stats", user_id, build, keep=("topics",))
+
+@api_router.get("/quiz/stats", response_model=QuizStatsResponse)
+async def get_quiz_stats(current_user: dict = Depends(get_current_user)):
+    stats = await db.quiz_stats.find_one({"user_id": current_user["id"]}, {"_id": 0})
+    if stats is None or not stats.get("backfilled"):
+        stats = await rebuild_quiz_stats(current_user)
+    attempts = stats.get("attempts", 0)
+
+    # A streak only counts as current if the last attempt was today or yesterday
+    today = datetime.now(timezone.utc).date()
+    last_day = stats.get("last_attempt_day")
+    current_streak = stats.get("current_streak", 0)
+    if not last_day or date.fromisoformat(last_day) < today - timedelta(days=1):
+        current_streak = 0
+
+    topics = [
+        QuizTopicStats(
+            topic=entry.get("topic", key),
+            correct=entry.get("correct", 0),
+            total=entry.get("total", 0),
+            accuracy=round(entry.get("correct", 0) / entry["total"] * 100, 1) if entry.get("total") else 0.0
+        )
+        for key, entry in sorted(stats.get("topics", {}).items())
+    ]
+    return QuizStatsResponse(
+        attempts=attempts,
+        average_percentage=round(stats.get("total_percentage", 0) / attempts, 1) if attempts else 0.0,
+        best_percentage=stats.get("best_percentage", 0),
+        best_score=stats.get("best_score", 0),
+        total_score=stats.get("total_score", 0),
+        total_questions=stats.get("total_questions", 0),
+        current_streak=current_streak,
+        longest_streak=stats.get("longest_streak", 0),
+        last_attempt_at=stats.get("last_attempt_at"),
+        topics=topics
+    )
+
+@api_router.get("/quiz/leaderboard", response_model=List[LeaderboardEntry])
+async def get_quiz_leaderboard(limit: int = Query(10, ge=1, le=100), current_user: dict = Depends(get_current_user)):
+    entries = await db.quiz_stats.find(
+        {"attempts": {"$gt": 0}},
+        {"_id": 0, "name": 1, "best_percentage": 1, "attempts": 1, "total_percentage": 1}
+    ).sort([("best_percentage", DESCENDING), ("total_score", DESCENDING)]).limit(limit).to_list(limit)
+    return [
+        LeaderboardEntry(
+            rank=rank,
+            name=entry.get("name", ""),
+            best_percentage=entry.get("best_percentage", 0),
+            attempts=entry["attempts"],
+            average_percentage=round(entry.get("total_percentage", 0) / entry["attempts"], 1)
+        )
+        for rank, entry in enumerate(entries, start=1)
+    ]
+
 @api_router.post("/quiz/submit", response_model=QuizSubmitResponse)
 async def submit_quiz(
     submission: QuizSubmitRequest,
     current_user: dict = Depends(get_current_user)
 ):
-    # Get active quiz session
-    active_session = await db.active_quiz_sessions.find_one({"user_id": current_user["id"]}, {"_id": 0})
-    if not active_session:
+    # Claim and remove the active session in one step so a double submit cannot be graded twice; a streamed
+    # session is created before its first question arrives, so one without questions is not submittable yet
+    session_filter = {
+        "user_id": current_user["id"],
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+        "questions.0": {"$exists": True},
+    }
+    if submission.session_id:
+        session_filter["session_id"] = submission.session_id
+    active_session = await db.active_quiz_sessions.find_one_and_delete(session_filter, projection={"_id": 0})
+    if not active_session or "questions" not in active_session:
         raise HTTPException(status_code=400, detail="No active quiz session found")
     
-    # Get quiz questions
-    quiz_session = await db.quiz_sessions.find_one({"id": active_session["session_id"]}, {"_id": 0})
-    if not quiz_session:
-        raise HTTPException(status_code=400, detail="Quiz session not found")
-    
     # Calculate score
-    questions = quiz_session["questions"]
+    questions = active_session["questions"]
     correct_answers = [q["correct_answer"] for q in questions]
     score = sum(1 for i, answer in enumerate(submission.answers) if i < len(correct_answers) and answer == correct_answers[i])
     total_questions = len(questions)
@@ -580,10 +3579,9 @@ async def submit_quiz(
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.quiz_attempts.insert_one(attempt_doc)
-    
-    # Clean up active session
-    await db.active_quiz_sessions.delete_one({"user_id": current_user["id"]})
+    # The attempt must be recorded before the stats update so a concurrent backfill counts it
+    await write_behind.insert("quiz_attempts", attempt_doc)
+    await update_quiz_stats(current_user, attempt_doc, questions)
     
     return QuizSubmitResponse(
         score=score,
@@ -595,21 +3593,109 @@ async def submit_quiz(
 
 @api_router.get("/quiz/history", response_model=List[QuizAttemptHistory])
 async def get_quiz_history(current_user: dict = Depends(get_current_user)):
-    attempts = await db.quiz_attempts.find(
-        {"user_id": current_user["id"]},
-        {"_id": 0, "id": 1, "score": 1, "total_questions": 1, "percentage": 1, "created_at": 1}
-    ).sort("created_at", -1).to_list(100)
+    projection = {"_id": 0, "id": 1, "score": 1, "total_questions": 1, "percentage": 1, "created_at": 1}
+    attempts = await db.quiz_attempts.find({"user_id": current_user["id"]}, projection).sort("created_at", -1).to_list(100)
+    attempts = merge_pending(
+        attempts, write_behind.pending_for("quiz_attempts", current_user["id"]), projection, ("created_at",), 100
+    )
     
-    return attempts
+    return trusted_json_response(attempts)
 
 # Root endpoint
 @api_router.get("/")
 async def root():
     return {"message": "Verdant API - Home Gardening Management System"}
 
+# Internal metrics endpoint
+def subsystem_stats() -> dict:
+    return {
+        "password_hashing": password_hasher.stats(),
+        "user_cache": {**user_cache.stats(), "claims_authenticated": user_cache_stats["claims"]},
+        "identification_cache": identification_cache.stats(),
+        "image_pipeline": image_pipeline.stats(),
+        "quiz_pool": quiz_question_pool.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "llm_output": dict(llm_output_stats),
+        "identification_jobs": identification_jobs.stats(),
+        "plant_catalog": plant_catalog.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "write_behind": write_behind.stats(),
+        "local_classifier": local_classifier.stats(),
+        "cache_invalidation": cache_invalidation_bus.stats(),
+    }
+
+def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer)):
+    if not METRICS_TOKEN or credentials is None or not hmac.compare_digest(credentials.credentials, METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Not authorized to read metrics")
+
+@api_router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    return subsystem_stats()
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def get_prometheus_metrics():
+    return Response(content=render_metrics(subsystem_stats()), media_type="text/plain; version=0.0.4")
+
+# Health probes
+# Liveness: the event loop is serving requests. Dependencies are checked by /readyz
+@app.get("/healthz", include_in_schema=False)
+@api_router.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+# Readiness: MongoDB answers, the startup index pass has run and the plant catalog is loaded
+@app.get("/readyz", include_in_schema=False)
+@api_router.get("/readyz")
+async def readyz():
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout=READINESS_PING_TIMEOUT_SECONDS)
+        mongo = True
+    except Exception:
+        mongo = False
+    checks = {
+        "mongo": mongo,
+        "indexes": index_status["ready"],
+        "catalog": plant_catalog.version is not None,
+    }
+    ready = all(checks.values())
+    content = {"status": "ready" if ready else "not_ready", "checks": checks}
+    if index_status["failed"]:
+        content["failed_indexes"] = index_status["failed"]
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
 # Include the router
 app.include_router(api_router)
 
+# Reject oversized uploads from Content-Length before the multipart body is parsed; chunked uploads
+# without one are left to the per-file limits in the handlers
+UPLOAD_SIZE_LIMITS = {
+    "/api/identify-plant/upload": IDENTIFY_UPLOAD_MAX_BYTES,
+    "/api/identify-plants/batch": IDENTIFY_UPLOAD_MAX_BYTES * IDENTIFY_BATCH_MAX_IMAGES,
+}
+
+class UploadSizeMiddleware:
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        # Allow a little slack for the multipart boundaries and part headers
+        if content_length.isdigit() and int(content_length) > limit + 64 * 1024:
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"Image exceeds the {limit // (1024 * 1024)}MB upload limit"}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+app.add_middleware(UploadSizeMiddleware, limits=UPLOAD_SIZE_LIMITS)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -617,8 +3703,33 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# Compress large bodies; streamed responses pass through so events are not held in the compressor
+STREAMING_PATH_SUFFIXES = ("/events", "/stream")
+
+# gzip, or brotli with gzip fallback when brotli-asgi is installed, above a size threshold
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int, level: int):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].endswith(STREAMING_PATH_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        await self.compressed(scope, receive, send)
+
+if RESPONSE_COMPRESSION_MIN_BYTES > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=RESPONSE_COMPRESSION_MIN_BYTES, level=RESPONSE_COMPRESSION_LEVEL)
+
+# Outermost, so latency includes every other middleware and sizes are what goes on the wire
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -626,11 +3737,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks = []
+
+# Prepare the database and caches after the server is already accepting connections
+async def warm_up():
+    delay = 1.0
+    while True:
+        try:
+            await ensure_indexes()
+            await seed_plants()
+            await plant_catalog.load()
+            break
+        except Exception as e:
+            logger.error(f"Warm-up failed, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    logger.info("Warm-up complete")
+    if index_status["failed"]:
+        background_tasks.append(asyncio.create_task(retry_failed_indexes()))
+    await local_classifier.build()
+
 @app.on_event("startup")
 async def startup_event():
-    await seed_plants()
+    background_tasks.append(asyncio.create_task(warm_up()))
+    write_behind.start()
+    cache_invalidation_bus.start()
+    if QUIZ_POOL_ENABLED:
+        quiz_question_pool.start()
+    identification_jobs.start()
+    background_tasks.append(asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL_SECONDS)))
     logger.info("Application started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await cache_invalidation_bus.stop()
+    await quiz_question_pool.stop()
+    await identification_jobs.stop()
+    # After the job workers, which may still be saving results
+    await write_behind.stop()
+    password_hasher.shutdown()
+    image_pipeline.shutdown()
     client.close()
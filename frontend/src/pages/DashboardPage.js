@@ -13,6 +13,7 @@ export default function DashboardPage() {
   const navigate = useNavigate();
   const { user, logout, token } = useAuth();
   const [quizHistory, setQuizHistory] = useState([]);
+  const [quizStats, setQuizStats] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -21,10 +22,13 @@ export default function DashboardPage() {
 
   const fetchQuizHistory = async () => {
     try {
-      const response = await axios.get(`${API}/quiz/history`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setQuizHistory(response.data);
+      const headers = { Authorization: `Bearer ${token}` };
+      const [historyResponse, statsResponse] = await Promise.all([
+        axios.get(`${API}/quiz/history`, { headers }),
+        axios.get(`${API}/quiz/stats`, { headers })
+      ]);
+      setQuizHistory(historyResponse.data);
+      setQuizStats(statsResponse.data);
     } catch (error) {
       console.error('Failed to fetch quiz history:', error);
     } finally {
@@ -38,9 +42,8 @@ export default function DashboardPage() {
     navigate('/');
   };
 
-  const avgScore = quizHistory.length > 0 
-    ? (quizHistory.reduce((sum, attempt) => sum + attempt.percentage, 0) / quizHistory.length).toFixed(1)
-    : 0;
+  const quizCount = quizStats ? quizStats.attempts : quizHistory.length;
+  const avgScore = quizStats ? quizStats.average_percentage.toFixed(1) : 0;
 
   return (
     <div className="min-h-screen bg-[#FDFCF8]">
@@ -97,7 +100,7 @@ export default function DashboardPage() {
               </div>
               <div>
                 <p className="text-sm text-stone-600">Quizzes Taken</p>
-                <p className="text-3xl font-heading font-semibold text-[#1A4D2E]" data-testid="quiz-count">{quizHistory.length}</p>
+                <p className="text-3xl font-heading font-semibold text-[#1A4D2E]" data-testid="quiz-count">{quizCount}</p>
               </div>
             </div>
           </motion.div>
@@ -35,19 +35,6 @@ export default function PlantIdentifierPage() {
     }
   };
 
-  const convertToBase64 = (file) => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onloadend = () => {
-        // Remove data URL prefix to get pure base64
-        const base64 = reader.result.split(',')[1];
-        resolve(base64);
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(file);
-    });
-  };
-
   const handleIdentify = async () => {
     if (!selectedImage) {
       toast.error('Please select an image first');
@@ -56,11 +43,13 @@ export default function PlantIdentifierPage() {
 
     setIdentifying(true);
     try {
-      const base64Image = await convertToBase64(selectedImage);
-      
+      // Send the raw file as multipart instead of a base64 JSON payload
+      const formData = new FormData();
+      formData.append('file', selectedImage);
+
       const response = await axios.post(
-        `${API}/identify-plant`,
-        { image_base64: base64Image },
+        `${API}/identify-plant/upload`,
+        formData,
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
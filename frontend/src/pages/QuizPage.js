@@ -14,26 +14,64 @@ export default function QuizPage() {
   const { token } = useAuth();
   const [loading, setLoading] = useState(false);
   const [questions, setQuestions] = useState([]);
+  const [sessionId, setSessionId] = useState(null);
   const [currentQuestion, setCurrentQuestion] = useState(0);
   const [answers, setAnswers] = useState([]);
   const [result, setResult] = useState(null);
   const [quizStarted, setQuizStarted] = useState(false);
+  const [streaming, setStreaming] = useState(false);
 
+  // Questions arrive one per line as the server generates them; the quiz starts with the first
   const startQuiz = async () => {
     setLoading(true);
+    setStreaming(true);
+    setQuestions([]);
+    setAnswers([]);
+    let received = 0;
     try {
-      const response = await axios.get(`${API}/quiz/generate`, {
+      const response = await fetch(`${API}/quiz/generate/stream`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setQuestions(response.data.questions);
-      setAnswers(new Array(response.data.questions.length).fill(''));
-      setQuizStarted(true);
-      toast.success('Quiz loaded! Good luck!');
+      if (!response.ok) {
+        throw new Error(`Quiz generation failed with status ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'session') {
+            setSessionId(event.session_id);
+          } else if (event.type === 'question') {
+            received += 1;
+            setQuestions(prev => [...prev, event.question]);
+            setAnswers(prev => [...prev, '']);
+            if (received === 1) {
+              setQuizStarted(true);
+              setLoading(false);
+              toast.success('Quiz loaded! Good luck!');
+            }
+          } else if (event.type === 'error') {
+            throw new Error(event.detail);
+          }
+        }
+      }
+      if (received === 0) {
+        throw new Error('No questions received');
+      }
     } catch (error) {
       console.error('Failed to generate quiz:', error);
-      toast.error('Failed to load quiz. Please try again.');
+      toast.error(received === 0 ? 'Failed to load quiz. Please try again.' : 'Some questions could not be loaded.');
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -66,7 +104,7 @@ export default function QuizPage() {
     try {
       const response = await axios.post(
         `${API}/quiz/submit`,
-        { answers },
+        { answers, session_id: sessionId },
         { headers: { Authorization: `Bearer ${token}` } }
       );
       setResult(response.data);
@@ -81,6 +119,7 @@ export default function QuizPage() {
 
   const handleRestart = () => {
     setQuestions([]);
+    setSessionId(null);
     setCurrentQuestion(0);
     setAnswers([]);
     setResult(null);
@@ -229,7 +268,7 @@ export default function QuizPage() {
               >
                 Previous
               </Button>
-              {currentQuestion === questions.length - 1 ? (
+              {currentQuestion === questions.length - 1 && !streaming ? (
                 <Button
                   onClick={handleSubmit}
                   disabled={loading || !answers[currentQuestion]}
@@ -241,7 +280,7 @@ export default function QuizPage() {
               ) : (
                 <Button
                   onClick={handleNext}
-                  disabled={!answers[currentQuestion]}
+                  disabled={!answers[currentQuestion] || currentQuestion === questions.length - 1}
                   className="bg-[#1A4D2E] hover:bg-[#1A4D2E]/90 rounded-full px-8 py-6"
                   data-testid="next-btn"
                 >
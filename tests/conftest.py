@@ -0,0 +1,18 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    database = mongomock_motor.AsyncMongoMockClient()["verdant_test"]
+    monkeypatch.setattr(server, "db", database)
+    return database
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from server import LlmGateway, LlmUnavailableError
+
+
+class FakeChat:
+    """Local stand-in for the model client: fixed latency, optional scripted failures."""
+
+    def __init__(self, latency=0.01, failures=()):
+        self.latency = latency
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self, system_message):
+        return self
+
+    async def send_message(self, text, image_base64=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            raise self.failures.pop(0)
+        return f"reply to {text}"
+
+
+def gateway(chat, max_concurrency=4, timeout=1.0, max_retries=2, breaker_threshold=3, breaker_cooldown=30.0):
+    return LlmGateway(max_concurrency, timeout, max_retries, 0.001, breaker_threshold, breaker_cooldown, chat)
+
+
+def test_send_returns_reply_and_passes_image():
+    chat = FakeChat()
+    assert asyncio.run(gateway(chat).send("system", "hello", "aW1n")) == "reply to hello"
+    assert chat.calls == 1
+
+
+def test_transient_errors_are_retried_and_count_one_failure():
+    chat = FakeChat(failures=[ConnectionError("reset"), ConnectionError("reset"), ConnectionError("reset")])
+    llm = gateway(chat, max_retries=2)
+    with pytest.raises(ConnectionError):
+        asyncio.run(llm.send("system", "hello"))
+    assert chat.calls == 3
+    assert llm.retries == 2
+    assert llm.failures == 1
+
+
+def test_breaker_opens_after_threshold_and_short_circuits():
+    chat = FakeChat(failures=[ValueError("bad request")] * 3)
+    llm = gateway(chat, breaker_threshold=3)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                await llm.send("system", "hello")
+        with pytest.raises(LlmUnavailableError) as raised:
+            await llm.send("system", "hello")
+        return raised.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    assert chat.calls == 3
+    assert llm.stats()["breaker_open"]
+
+
+def test_upstream_deadline_is_a_504_failure():
+    llm = gateway(FakeChat(latency=0.5), timeout=0.05)
+    with pytest.raises(LlmUnavailableError) as raised:
+        asyncio.run(llm.send("system", "hello"))
+    assert raised.value.status_code == 504
+    assert llm.failures == 1
+
+
+def test_waiting_for_a_slot_is_a_503_and_leaves_the_breaker_closed():
+    llm = gateway(FakeChat(latency=0.15), max_concurrency=1, timeout=0.2, breaker_threshold=2)
+
+    async def run():
+        return await asyncio.gather(*(llm.send("system", f"q{i}") for i in range(6)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    busy = [r for r in results if isinstance(r, LlmUnavailableError) and r.status_code == 503]
+    assert busy
+    assert llm.slot_timeouts == len(busy)
+    assert not llm.stats()["breaker_open"]
+
+
+def test_identical_requests_are_coalesced():
+    chat = FakeChat(latency=0.05)
+    llm = gateway(chat)
+
+    async def run():
+        return await asyncio.gather(*(llm.send("system", "same", coalesce=True) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["reply to same"] * 5
+    assert chat.calls == 1
+    assert llm.coalesced == 4
+    assert not llm.in_flight
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    chat = FakeChat(latency=0.05)
+    llm = gateway(chat)
+
+    async def run():
+        leader = asyncio.create_task(llm.send("system", "same", coalesce=True))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(llm.send("system", "same", coalesce=True))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return leader, await follower
+
+    leader, reply = asyncio.run(run())
+    assert leader.cancelled()
+    assert reply == "reply to same"
+    assert chat.calls == 1
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from server import LlmOutputError, parse_identification, parse_llm_json, parse_quiz_questions
+
+
+def test_plain_json():
+    assert parse_llm_json('{"a": 1}') == ({"a": 1}, False)
+
+
+def test_fenced_block_wins_over_surrounding_prose():
+    reply = 'Sure! {not json}\n```json\n{"a": [1, 2]}\n```\nHope that helps.'
+    assert parse_llm_json(reply) == ({"a": [1, 2]}, False)
+
+
+def test_bare_array_inside_prose():
+    assert parse_llm_json('Here: [{"a": 1}, {"a": 2}] done') == ([{"a": 1}, {"a": 2}], False)
+
+
+@pytest.mark.parametrize("reply", [
+    "{'a': 1, 'b': [2, 3,],}",
+    '{“a”: 1}',
+    '{"a": [1, 2',
+])
+def test_common_defects_are_repaired(reply):
+    value, repaired = parse_llm_json(reply)
+    assert repaired
+    assert value["a"] in (1, [1, 2])
+
+
+def test_unusable_reply_raises():
+    with pytest.raises(LlmOutputError):
+        parse_llm_json("I cannot help with that.")
+
+
+def test_identification_missing_fields_raise():
+    with pytest.raises(LlmOutputError):
+        parse_identification('{"plant_name": "Basil"}')
+
+
+def test_quiz_letter_answers_and_option_maps_are_repaired():
+    reply = json.dumps({"questions": [{"question": "Q?", "options": {"A": "Sand", "B": "Clay"}, "correct_answer": "b"}]})
+    questions, _ = parse_quiz_questions(reply)
+    assert questions[0]["options"] == ["Sand", "Clay"]
+    assert questions[0]["correct_answer"] == "Clay"
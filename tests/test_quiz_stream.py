@@ -0,0 +1,76 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import QuizStreamParser
+
+QUESTIONS = {"questions": [
+    {"question": f"Question {i}?", "options": ["Sand", "Clay", "Silt", "Peat"], "correct_answer": "Clay"}
+    for i in range(3)
+]}
+
+
+def test_stream_parser_emits_each_question_as_it_closes():
+    reply = "Here you go:\n```json\n" + json.dumps(QUESTIONS, indent=2) + "\n```"
+    parser = QuizStreamParser()
+    emitted = []
+    for start in range(0, len(reply), 7):
+        emitted.extend(question["question"] for question in parser.feed(reply[start:start + 7]))
+    assert emitted == ["Question 0?", "Question 1?", "Question 2?"]
+
+
+def test_stream_parser_ignores_braces_inside_strings_and_skips_invalid_items():
+    reply = json.dumps({"questions": [
+        {"question": "Which {bracket} is ] here?", "options": ["A", "B"], "correct_answer": "A"},
+        {"question": "No options"},
+    ]})
+    parser = QuizStreamParser()
+    emitted = [question for char in reply for question in parser.feed(char)]
+    assert [question["question"] for question in emitted] == ["Which {bracket} is ] here?"]
+
+
+def test_submit_rejects_a_streamed_session_before_its_first_question(mongo):
+    user = {"id": "u1", "name": "Ada"}
+
+    async def run():
+        await mongo.active_quiz_sessions.insert_one({
+            "user_id": user["id"],
+            "session_id": "s1",
+            "questions": [],
+            "expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
+        })
+        with pytest.raises(HTTPException) as excinfo:
+            await server.submit_quiz(server.QuizSubmitRequest(answers=[], session_id="s1"), user)
+        return excinfo.value, await mongo.active_quiz_sessions.count_documents({}), await mongo.quiz_attempts.count_documents({})
+
+    error, sessions, attempts = asyncio.run(run())
+    assert error.status_code == 400
+    assert (sessions, attempts) == (1, 0)
+
+
+def test_live_fallback_serves_at_most_one_quiz_and_marks_only_those_seen(mongo, monkeypatch):
+    user = {"id": "u1", "name": "Ada"}
+    generated = [
+        {"question": f"Question {i}?", "options": ["Sand", "Clay"], "correct_answer": "Clay"}
+        for i in range(server.QUIZ_QUESTIONS_PER_QUIZ + 3)
+    ]
+
+    async def fake_request(subject, count):
+        return [dict(question) for question in generated]
+
+    monkeypatch.setattr(server, "QUIZ_POOL_ENABLED", True)
+    monkeypatch.setattr(server, "request_llm_quiz_questions", fake_request)
+
+    async def run():
+        response = await server.generate_quiz(user)
+        session = await mongo.active_quiz_sessions.find_one({"user_id": user["id"]})
+        return response, session, await server.quiz_question_pool.seen_question_ids(user["id"]), await mongo.quiz_question_bank.count_documents({})
+
+    response, session, seen, banked = asyncio.run(run())
+    assert len(response.questions) == len(session["questions"]) == server.QUIZ_QUESTIONS_PER_QUIZ
+    assert len(seen) == server.QUIZ_QUESTIONS_PER_QUIZ
+    assert banked == len(generated)
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from server import RateLimiter
+
+
+def limiter(spec="3/60", max_keys=100):
+    return RateLimiter(True, "memory", max_keys, {"identify": spec})
+
+
+def test_burst_then_limited_with_retry_after(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("server.time.monotonic", lambda: clock[0])
+    rate_limiter = limiter("3/60")
+    rule = rate_limiter.rules["identify"]
+    assert [rate_limiter._take_memory(rule, "user", 1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert rate_limiter._take_memory(rule, "user", 1) == pytest.approx(20.0)
+    clock[0] += 20
+    assert rate_limiter._take_memory(rule, "user", 1) == 0.0
+
+
+def test_buckets_are_per_key_and_bounded():
+    rate_limiter = limiter("1/60", max_keys=2)
+    rule = rate_limiter.rules["identify"]
+    assert rate_limiter._take_memory(rule, "a", 1) == 0.0
+    assert rate_limiter._take_memory(rule, "b", 1) == 0.0
+    assert rate_limiter._take_memory(rule, "a", 1) > 0
+    rate_limiter._take_memory(rule, "c", 1)
+    assert len(rate_limiter.buckets) == 2
+    # "b" was least recently used and evicted, so it starts full again
+    assert rate_limiter._take_memory(rule, "b", 1) == 0.0
+
+
+def test_check_raises_429_and_caps_cost_at_burst():
+    rate_limiter = limiter("4/60")
+
+    async def run():
+        await rate_limiter.check("identify", "user", cost=10)
+        with pytest.raises(HTTPException) as raised:
+            await rate_limiter.check("identify", "user")
+        return raised.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert int(error.headers["Retry-After"]) >= 1
+    assert rate_limiter.stats()["rules"]["identify"] == {"capacity": 4, "refill_per_second": 0.0667, "allowed": 1, "limited": 1}
@@ -0,0 +1,111 @@
+import asyncio
+import uuid
+
+import pytest
+from pymongo import ASCENDING
+
+import server
+
+USER = {"id": "u1", "name": "Ada"}
+
+
+@pytest.fixture
+def rollup_db(mongo):
+    async def indexes():
+        for collection in ("identification_summaries", "quiz_stats"):
+            await mongo[collection].create_index([("user_id", ASCENDING)], unique=True)
+
+    asyncio.run(indexes())
+    return mongo
+
+
+def identification(day, plant_name="Basil"):
+    return {
+        "id": str(uuid.uuid4()), "user_id": USER["id"], "plant_name": plant_name, "botanical_name": "x",
+        "confidence": "high", "identified_at": f"2026-01-{day:02d}T00:00:00+00:00",
+    }
+
+
+def quiz_attempt(day, percentage):
+    score = int(percentage / 20)
+    return {
+        "id": str(uuid.uuid4()), "user_id": USER["id"], "score": score, "total_questions": 5,
+        "percentage": percentage, "answers": [], "correct_answers": [],
+        "created_at": f"2026-01-{day:02d}T00:00:00+00:00",
+    }
+
+
+async def record_identification(db, doc):
+    await db.plant_identifications.insert_one(dict(doc))
+    await server.update_identification_summary(USER["id"], [doc])
+
+
+def test_summary_created_by_first_new_identification_is_backfilled(rollup_db):
+    async def run():
+        await rollup_db.plant_identifications.insert_many([identification(day) for day in range(1, 6)])
+        await record_identification(rollup_db, identification(6, "Fern"))
+        first = await server.get_identification_summary(USER)
+        await record_identification(rollup_db, identification(7, "Fern"))
+        return first, await server.get_identification_summary(USER)
+
+    first, second = asyncio.run(run())
+    assert first.total == 6
+    assert second.total == 7
+    assert {plant.plant_name: plant.count for plant in second.plants} == {"Basil": 5, "Fern": 2}
+
+
+def test_rebuild_retries_when_an_increment_races_it(rollup_db):
+    calls = []
+
+    async def build():
+        calls.append(1)
+        if len(calls) == 1:
+            await record_identification(rollup_db, identification(2))
+        return {"total": await rollup_db.plant_identifications.count_documents({})}
+
+    async def run():
+        await record_identification(rollup_db, identification(1))
+        rebuilt = await server.store_rebuilt_rollup("identification_summaries", USER["id"], build)
+        stored = await rollup_db.identification_summaries.find_one({"user_id": USER["id"]}, {"_id": 0})
+        return rebuilt, stored
+
+    rebuilt, stored = asyncio.run(run())
+    assert len(calls) == 2
+    assert rebuilt["total"] == stored["total"] == 2
+    assert stored["backfilled"]
+
+
+def test_quiz_stats_created_by_first_new_submit_are_backfilled(rollup_db):
+    questions = [{"question": "Q?", "options": ["a", "b"], "correct_answer": "a"}] * 5
+
+    async def run():
+        await rollup_db.quiz_attempts.insert_many([quiz_attempt(day, 100.0) for day in range(1, 6)])
+        latest = quiz_attempt(6, 0.0)
+        await rollup_db.quiz_attempts.insert_one(dict(latest))
+        await server.update_quiz_stats(USER, latest, questions)
+        return await server.get_quiz_stats(USER)
+
+    stats = asyncio.run(run())
+    assert stats.attempts == 6
+    assert stats.average_percentage == pytest.approx(83.3)
+    assert stats.best_percentage == 100.0
+    assert stats.longest_streak == 6
+
+
+def test_quiz_topics_survive_the_first_read(rollup_db):
+    questions = [
+        {"question": f"Q{i}?", "options": ["a", "b"], "correct_answer": "a", "topic": "soil types"}
+        for i in range(5)
+    ]
+
+    async def run():
+        attempt = dict(quiz_attempt(1, 100.0), answers=["a"] * 5)
+        await rollup_db.quiz_attempts.insert_one(dict(attempt))
+        await server.update_quiz_stats(USER, attempt, questions)
+        first = await server.get_quiz_stats(USER)
+        return first, await server.get_quiz_stats(USER)
+
+    first, second = asyncio.run(run())
+    for stats in (first, second):
+        assert stats.attempts == 1
+        assert [(topic.topic, topic.correct, topic.total) for topic in stats.topics] == [("soil types", 5, 5)]
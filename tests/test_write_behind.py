@@ -0,0 +1,62 @@
+import asyncio
+
+from server import WriteBehindBuffer
+
+
+def attempt(i, user_id="u1"):
+    return {"id": f"a{i}", "user_id": user_id, "score": i}
+
+
+def test_batches_are_flushed_and_visible_while_pending(mongo):
+    async def run():
+        buffer = WriteBehindBuffer(True, 100, 30.0, 1000)
+        buffer.start()
+        for i in range(3):
+            await buffer.insert("quiz_attempts", attempt(i))
+        await buffer.insert("quiz_attempts", attempt(9, user_id="u2"))
+        pending = [doc["id"] for doc in buffer.pending_for("quiz_attempts", "u1")]
+        before = await mongo.quiz_attempts.count_documents({})
+        await buffer.flush()
+        after = await mongo.quiz_attempts.count_documents({})
+        await buffer.stop()
+        return buffer, pending, before, after
+
+    buffer, pending, before, after = asyncio.run(run())
+    assert pending == ["a0", "a1", "a2"]
+    assert (before, after) == (0, 4)
+    assert buffer.stats()["batches"] == 1
+    assert buffer.pending_for("quiz_attempts", "u1") == []
+
+
+def test_stop_waits_for_a_flush_in_progress(mongo, monkeypatch):
+    collection_type = type(mongo.quiz_attempts)
+    original = collection_type.insert_many
+
+    async def slow_insert_many(self, docs, **kwargs):
+        await asyncio.sleep(0.2)
+        return await original(self, docs, **kwargs)
+
+    monkeypatch.setattr(collection_type, "insert_many", slow_insert_many)
+
+    async def run():
+        buffer = WriteBehindBuffer(True, 100, 0.01, 1000)
+        buffer.start()
+        for i in range(3):
+            await buffer.insert("quiz_attempts", attempt(i))
+        await asyncio.sleep(0.05)
+        assert buffer.stats()["in_flight"] == 3
+        await buffer.stop()
+        return buffer, await mongo.quiz_attempts.count_documents({})
+
+    buffer, saved = asyncio.run(run())
+    assert saved == 3
+    assert buffer.stats()["queued"] == 0
+
+
+def test_inserts_while_stopped_are_written_immediately(mongo):
+    async def run():
+        buffer = WriteBehindBuffer(True, 100, 30.0, 1000)
+        await buffer.insert("quiz_attempts", attempt(1))
+        return await mongo.quiz_attempts.count_documents({})
+
+    assert asyncio.run(run()) == 1